@@ -0,0 +1,156 @@
+"""Reproducible benchmarks of board generation and solving.
+
+Every board is generated from a fixed seed, so two runs measure the same work and
+their JSON reports can be compared for regressions::
+
+    python benchmark.py --output before.json
+    python benchmark.py --sizes beginner expert --boards 50
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple, Union
+
+from solver import LINEAR_INFERENCE, MineSolver, generate_board, is_solvable_attempt, regenerate_mines
+
+# Board sizes, and the number of boards generated per density by default
+SIZES: Dict[str, Tuple[int, int, int]] = {
+    'beginner': (9, 9, 40),
+    'intermediate': (16, 16, 20),
+    'expert': (30, 16, 20),
+    'large': (100, 100, 3),
+}
+DENSITIES = (0.10, 0.15, 0.20)
+# Solver configurations, the full-pass engines are only run up to LEGACY_MAX_CELLS
+ENGINES: Dict[str, Dict[str, Union[bool, str]]] = {
+    'incremental': {'incremental': True},
+    'legacy': {'incremental': False},
+    'linear': {'incremental': True, 'inference': LINEAR_INFERENCE},
+    'local': {'incremental': True, 'global_inference': False},
+    'linear_local': {'incremental': True, 'inference': LINEAR_INFERENCE, 'global_inference': False},
+}
+LEGACY_MAX_CELLS = 30 * 16
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+        'min': min(values),
+        'max': max(values),
+    }
+
+
+def peak_memory(run: Callable[[], object]) -> int:
+    """Peak bytes allocated by Python while ``run`` executes."""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_case(width: int, height: int, mines: int, boards: int, seed: int) -> dict:
+    """Generate ``boards`` boards of one setup and solve each of them with every engine.
+
+    Every engine also checks all the layouts the generator tried, so their acceptance
+    rates are measured on the same layouts.
+    """
+    first_x, first_y = width // 2, height // 2
+
+    layouts = []
+    attempts = []
+    generate_seconds = []
+    for k in range(boards):
+        start = time.perf_counter()
+        board = generate_board(mines, width, height, first_x, first_y, seed + k)
+        generate_seconds.append(time.perf_counter() - start)
+        attempts.append(board.attempt + 1)
+        layouts.append(board.mines)
+
+    result = {
+        'width': width,
+        'height': height,
+        'mines': mines,
+        'density': mines / (width * height),
+        'boards': boards,
+        'seed': seed,
+        'generation': {
+            'seconds_per_board': summarize(generate_seconds),
+            'attempts_per_board': summarize(attempts),
+            'acceptance_rate': boards / sum(attempts),
+            # Attempts don't keep anything alive, so one attempt shows the peak of the whole search
+            'attempt_peak_bytes': peak_memory(
+                lambda: is_solvable_attempt(mines, width, height, first_x, first_y, seed, attempts[0] - 1)),
+        },
+        'solve': {},
+    }
+
+    for engine, options in ENGINES.items():
+        if not options['incremental'] and width * height > LEGACY_MAX_CELLS:
+            continue
+        accepted = sum(MineSolver(regenerate_mines(mines, width, height, first_x, first_y, seed + k, attempt),
+                                  **options).check_solvable(first_x, first_y).solvable
+                       for k, count in enumerate(attempts) for attempt in range(count))
+        seconds = []
+        passes = []
+        clues_per_pass = []
+        for layout in layouts:
+            solver = MineSolver(layout, **options)
+            start = time.perf_counter()
+            solver.solve(first_x, first_y)
+            seconds.append(time.perf_counter() - start)
+            passes.append(solver.rounds)
+            clues_per_pass.append(solver.steps / max(solver.rounds, 1))
+        result['solve'][engine] = {
+            'acceptance_rate': accepted / sum(attempts),
+            'seconds': summarize(seconds),
+            'passes': summarize(passes),
+            'clues_per_pass': summarize(clues_per_pass),
+            'peak_bytes': peak_memory(lambda: MineSolver(layouts[0], **options).solve(first_x, first_y)),
+        }
+    return result
+
+
+def run(sizes: List[str], densities: List[float], boards: int, seed: int) -> dict:
+    cases = {}
+    for size in sizes:
+        width, height, default_boards = SIZES[size]
+        for density in densities:
+            mines = round(density * width * height)
+            name = f'{size}-{density:.2f}'
+            print(f'{name}: {width}x{height}, {mines} mines', file=sys.stderr)
+            cases[name] = bench_case(width, height, mines, boards or default_boards, seed)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'cases': cases,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark board generation and MineSolver.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--densities', nargs='+', type=float, default=list(DENSITIES))
+    parser.add_argument('--boards', type=int, help='boards per case (default depends on the size)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first board of every case')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.densities, args.boards, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
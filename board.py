@@ -0,0 +1,144 @@
+from typing import Iterator, List, Optional, Tuple
+
+
+class Grid:
+    """Flat, column-major board layout with a one-cell border.
+
+    Every cell of the board is one byte at ``index(x, y)``. The border cells around
+    the board let every real cell reach its eight neighbors through the fixed
+    ``offsets`` without any bounds checks.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.stride = height + 2  # Bytes per column, including the top and bottom border
+        self.size = (width + 2) * self.stride
+        s = self.stride
+        self.offsets = (-s - 1, -s, -s + 1, -1, 1, s - 1, s, s + 1)
+
+    def index(self, x: int, y: int) -> int:
+        """Flat index of the cell at (x, y)."""
+        return (x + 1) * self.stride + y + 1
+
+    def coords(self, i: int) -> Tuple[int, int]:
+        """Board coordinates of a flat index."""
+        x, y = divmod(i, self.stride)
+        return x - 1, y - 1
+
+    def cells(self) -> Iterator[int]:
+        """Flat indices of all cells on the board, column by column."""
+        for x in range(self.width):
+            start = self.index(x, 0)
+            yield from range(start, start + self.height)
+
+    def pack(self, grid: List[List[int]]) -> bytearray:
+        """Convert a grid[x][y] list of lists to the flat layout, the border is 0."""
+        cells = bytearray(self.size)
+        for x in range(self.width):
+            start = self.index(x, 0)
+            cells[start:start + self.height] = bytes(grid[x])
+        return cells
+
+    def unpack(self, cells: bytes) -> List[List[int]]:
+        """Convert the flat layout back to a grid[x][y] list of lists."""
+        return [list(cells[self.index(x, 0):self.index(x, 0) + self.height]) for x in range(self.width)]
+
+    def compute_hints(self, mines: bytes) -> bytearray:
+        """Count the mines around every cell in one vectorized pass.
+
+        The whole board is read as a single integer with one byte lane per cell, so
+        adding the eight shifted copies convolves every cell with its neighborhood at
+        once. A count never exceeds 8, so no lane carries into the next. The values
+        in the border lanes are meaningless.
+        """
+        value = int.from_bytes(mines, 'little')
+        total = 0
+        for offset in self.offsets:
+            total += value >> (8 * offset) if offset > 0 else value << (-8 * offset)
+        total &= (1 << (8 * self.size)) - 1
+        return bytearray(total.to_bytes(self.size, 'little'))
+
+
+class Board:
+    """A mine layout in the flat Grid layout, together with its hints.
+
+    The hints are computed once when the board is built, and the generator, the
+    solver and the game share the same Board instead of recomputing them. Moving a
+    mine only updates the hints around its old and new cell.
+    """
+
+    def __init__(self, grid: Grid, mines: bytearray, hints: Optional[bytearray] = None):
+        self.grid = grid
+        self.mines = mines  # 1 for a mine, the border is 0
+        self.hints = grid.compute_hints(mines) if hints is None else hints
+
+    @classmethod
+    def from_layout(cls, layout: List[List[int]]) -> 'Board':
+        """Board of a grid[x][y] mine layout."""
+        width = len(layout)
+        height = len(layout[0]) if width > 0 else 0
+        grid = Grid(width, height)
+        return cls(grid, grid.pack(layout))
+
+    @property
+    def width(self) -> int:
+        return self.grid.width
+
+    @property
+    def height(self) -> int:
+        return self.grid.height
+
+    def layout(self) -> List[List[int]]:
+        """The mines as grid[x][y]."""
+        return self.grid.unpack(self.mines)
+
+    def hint_layout(self) -> List[List[int]]:
+        """The hints as grid[x][y]."""
+        return self.grid.unpack(self.hints)
+
+    def copy(self) -> 'Board':
+        return Board(self.grid, self.mines[:], self.hints[:])
+
+    def move_mine(self, source: int, target: int):
+        """Move the mine at flat index ``source`` to the empty cell ``target``.
+
+        Only the sixteen hints around the two cells change. Every lane of the hints,
+        the border included, counts the mines next to it, so no lane can underflow.
+        """
+        if not self.mines[source] or self.mines[target]:
+            raise ValueError('a mine can only move from a mine to an empty cell')
+        self.mines[source] = 0
+        self.mines[target] = 1
+        hints = self.hints
+        for offset in self.grid.offsets:
+            hints[source + offset] -= 1
+            hints[target + offset] += 1
+
+
+def compute_hints(mines: List[List[int]]) -> List[List[int]]:
+    """Hints of a grid[x][y] mine layout."""
+    width = len(mines)
+    height = len(mines[0]) if width > 0 else 0
+    grid = Grid(width, height)
+    return grid.unpack(grid.compute_hints(grid.pack(mines)))
+
+
+_BITS_TO_TEXT = bytes.maketrans(b'\x00\x01', b'01')
+_TEXT_TO_BITS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def pack_bits(mines: List[List[int]]) -> bytes:
+    """Bit-pack a grid[x][y] mine layout, one bit per cell in column-major order."""
+    text = b''.join(bytes(column) for column in mines).translate(_BITS_TO_TEXT)
+    if not text:
+        return b''
+    return int(text[::-1], 2).to_bytes((len(text) + 7) // 8, 'little')
+
+
+def unpack_bits(data: bytes, width: int, height: int) -> List[List[int]]:
+    """Inverse of pack_bits."""
+    count = width * height
+    value = int.from_bytes(data, 'little')
+    cells = format(value, f'0{count}b')[::-1].encode().translate(_TEXT_TO_BITS)
+    return [list(cells[x * height:(x + 1) * height]) for x in range(width)]
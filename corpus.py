@@ -0,0 +1,173 @@
+"""Generate no-guess boards in bulk and store them in a compact binary corpus.
+
+The file starts with a fixed header followed by fixed-size records, so any board
+can be read by index from a memory map without loading the rest of the file::
+
+    python corpus.py boards.bin --count 10000 --width 30 --height 16 --mines 99
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from board import pack_bits, unpack_bits
+from solver import GeneratedBoard, generate_board
+
+MAGIC = b'MSBC'
+VERSION = 1
+# magic, version, width, height, mines, first x, first y, record count, record size
+HEADER = struct.Struct('<4sHHHIHHII')
+HEADER_SIZE = 32  # HEADER padded, so the records start aligned
+RECORD = struct.Struct('<QI')  # seed and accepted attempt, followed by the bit-packed mines
+
+
+def mask_size(width: int, height: int) -> int:
+    """Bytes of one bit-packed mine layout."""
+    return (width * height + 7) // 8
+
+
+class CorpusWriter:
+    """Appends boards of one setup to a corpus file.
+
+    The record count in the header is rewritten after every record, so a file cut
+    short by an interrupted run is still a valid corpus of the boards written so far.
+    """
+
+    def __init__(self, file: BinaryIO, width: int, height: int, mines: int, first_x: int, first_y: int):
+        self.file = file
+        self.setup = (width, height, mines, first_x, first_y)
+        self.record_size = RECORD.size + mask_size(width, height)
+        self.count = 0
+        self.write_header()
+
+    def write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, *self.setup, self.count, self.record_size)
+        self.file.seek(0)
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def append(self, seed: int, attempt: int, mask: bytes):
+        self.file.seek(HEADER_SIZE + self.count * self.record_size)
+        self.file.write(RECORD.pack(seed, attempt) + mask)
+        self.count += 1
+        self.write_header()
+
+
+class BoardCorpus:
+    """Read-only, memory-mapped view of a corpus file."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, *setup, count, record_size = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} board corpus')
+        self.width, self.height, self.mines, self.first_x, self.first_y = setup
+        self.count = count
+        self.record_size = record_size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, index: int) -> Tuple[int, int, bytes]:
+        """Seed, attempt and bit-packed mines of one board."""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        offset = HEADER_SIZE + index * self.record_size
+        seed, attempt = RECORD.unpack_from(self.data, offset)
+        return seed, attempt, self.data[offset + RECORD.size:offset + self.record_size]
+
+    def __getitem__(self, index: int) -> GeneratedBoard:
+        seed, attempt, mask = self.record(index)
+        return GeneratedBoard(unpack_bits(mask, self.width, self.height), seed, attempt)
+
+    def __iter__(self) -> Iterator[GeneratedBoard]:
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self) -> 'BoardCorpus':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def generate_record(mines, width, height, first_x, first_y, seed) -> Tuple[int, int, bytes]:
+    """Generate one board in a worker process and return it ready to be written."""
+    board = generate_board(mines, width, height, first_x, first_y, seed)
+    return board.seed, board.attempt, pack_bits(board.mines)
+
+
+def write_corpus(path: str, count: int, width: int, height: int, mines: int, first_x: int, first_y: int,
+                 seed: Optional[int] = None, workers: Optional[int] = None) -> int:
+    """Generate ``count`` boards on a process pool and stream them to ``path``.
+
+    Board ``i`` is generated from seed ``seed + i``, so a run is reproducible even
+    though the records are written in the order the boards finish. Returns the
+    base seed.
+    """
+    if seed is None:
+        seed = random.getrandbits(63)
+    workers = workers or os.cpu_count() or 1
+    setup = (mines, width, height, first_x, first_y)
+
+    with open(path, 'w+b') as file, ProcessPoolExecutor(workers) as executor:
+        writer = CorpusWriter(file, width, height, mines, first_x, first_y)
+        pending: Dict[Future, int] = {}
+        submitted = 0
+        # Only a few boards per worker are queued, so a huge count needs no memory up front
+        while submitted < count or pending:
+            while submitted < count and len(pending) < workers * 4:
+                board_seed = (seed + submitted) % (1 << 64)
+                pending[executor.submit(generate_record, *setup, board_seed)] = submitted
+                submitted += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                writer.append(*future.result())
+    return seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate no-guess Minesweeper boards into a binary corpus.')
+    parser.add_argument('output', help='corpus file to write')
+    parser.add_argument('--count', type=int, required=True, help='number of boards')
+    parser.add_argument('--width', type=int, default=30)
+    parser.add_argument('--height', type=int, default=16)
+    mines = parser.add_mutually_exclusive_group()
+    mines.add_argument('--mines', type=int, help='number of mines (default 99)')
+    mines.add_argument('--density', type=float, help='fraction of the cells that are mines')
+    parser.add_argument('--first-x', type=int, help='column of the first click (default center)')
+    parser.add_argument('--first-y', type=int, help='row of the first click (default center)')
+    parser.add_argument('--seed', type=int, help='base seed, board i uses seed + i')
+    parser.add_argument('--workers', type=int, help='worker processes (default CPU count)')
+    args = parser.parse_args(argv)
+
+    if args.density is not None:
+        mine_count = round(args.density * args.width * args.height)
+    else:
+        mine_count = 99 if args.mines is None else args.mines
+    first_x = args.width // 2 if args.first_x is None else args.first_x
+    first_y = args.height // 2 if args.first_y is None else args.first_y
+    if not (0 <= first_x < args.width and 0 <= first_y < args.height):
+        parser.error('the first click must be on the board')
+    if mine_count > args.width * args.height - 9:
+        parser.error('too many mines for the board')
+
+    start = time.perf_counter()
+    seed = write_corpus(args.output, args.count, args.width, args.height, mine_count, first_x, first_y,
+                        args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f'{args.count} boards ({args.width}x{args.height}, {mine_count} mines) written to {args.output} '
+          f'in {elapsed:.1f}s, seed {seed}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""不依赖tkinter的扫雷规则和回放记录，界面和批量模拟共用"""
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from board import Board
+from solver import Action, MineSolver, generate_safe_board
+
+
+@dataclass
+class GameState:
+    """游戏状态快照"""
+    mines: List[List[bool]]
+    hints: List[List[int]]
+    revealed: List[List[bool]]
+    flagged: List[List[bool]]
+    mines_remaining: int
+    game_over: bool
+    revealed_safe: int = 0  # 已揭开的非地雷格子数
+    correct_flags: int = 0  # 标记在地雷上的旗子数
+
+
+@dataclass
+class ReplayStep:
+    """回放步骤，包含动作和它带来的变化"""
+    action: Action
+    revealed: List[Tuple[int, int]]  # 本步新揭开的格子
+    flagged: List[Tuple[int, int]]  # 本步新标记的格子
+    mines_remaining: int  # 执行后的剩余地雷数
+    game_over: bool  # 执行后是否结束
+    revealed_safe: int  # 执行后已揭开的非地雷格子数
+    correct_flags: int  # 执行后标记在地雷上的旗子数
+
+
+def copy_state(state: GameState) -> GameState:
+    """复制可变部分，地雷和提示不会改变，直接共享"""
+    return GameState(
+        mines=state.mines,
+        hints=state.hints,
+        revealed=[column[:] for column in state.revealed],
+        flagged=[column[:] for column in state.flagged],
+        mines_remaining=state.mines_remaining,
+        game_over=state.game_over,
+        revealed_safe=state.revealed_safe,
+        correct_flags=state.correct_flags
+    )
+
+
+def count_correct_flags(mines: List[List[bool]], flagged: List[List[bool]]) -> int:
+    """数出标记在地雷上的旗子，只在放置地雷时需要，之后的计数都是增量更新"""
+    return sum(mine and flag for mine_column, flag_column in zip(mines, flagged)
+               for mine, flag in zip(mine_column, flag_column))
+
+
+def flood_reveal(hints: List[List[int]], revealed: List[List[bool]], flagged: List[List[bool]],
+                 x: int, y: int) -> List[Tuple[int, int]]:
+    """从(x, y)开始揭开格子，提示为0的格子继续揭开周围的格子
+
+    用广度优先的队列代替递归，大片空白区域也不会超过递归深度。
+    直接修改revealed，返回按揭开顺序排列的新揭开的格子。
+    """
+    width = len(revealed)
+    height = len(revealed[0]) if width > 0 else 0
+    if not (0 <= x < width and 0 <= y < height) or revealed[x][y] or flagged[x][y]:
+        return []
+
+    revealed[x][y] = True
+    cells = [(x, y)]
+    for cx, cy in cells:  # 边遍历边追加，列表本身就是队列
+        if hints[cx][cy]:
+            continue
+        for nx in range(max(cx - 1, 0), min(cx + 2, width)):
+            revealed_column = revealed[nx]
+            flagged_column = flagged[nx]
+            for ny in range(max(cy - 1, 0), min(cy + 2, height)):
+                if not revealed_column[ny] and not flagged_column[ny]:
+                    revealed_column[ny] = True
+                    cells.append((nx, ny))
+    return cells
+
+
+MIN_KEYFRAME_INTERVAL = 64  # 小棋盘上定位时最多重放的步数
+MAX_KEYFRAMES = 16  # 大棋盘上一次求解大约保存的关键帧数
+
+
+class ReplayTimeline:
+    """回放时间线，每步只保存变化，每隔若干步保存一个关键帧
+
+    每个关键帧都是整个棋盘的副本，所以默认间隔随棋盘面积增长：每个格子最多被操作一次，
+    关键帧不会超过MAX_KEYFRAMES个左右，内存和棋盘面积成正比。
+    """
+
+    def __init__(self, initial: GameState, keyframe_interval: Optional[int] = None):
+        if keyframe_interval is None:
+            area = len(initial.revealed) * len(initial.revealed[0])
+            keyframe_interval = max(MIN_KEYFRAME_INTERVAL, area // MAX_KEYFRAMES)
+        self.keyframe_interval = keyframe_interval
+        self.steps: List[ReplayStep] = []
+        # keyframes[k] 是执行前 k * keyframe_interval 步之后的状态
+        self.keyframes: List[GameState] = [copy_state(initial)]
+        self.state = copy_state(initial)  # 当前状态，记录和回放都在它上面进行
+        self.position: Optional[int] = 0  # 当前状态已执行的步数，None表示需要从关键帧恢复
+
+    def append(self, action: Action, revealed: List[Tuple[int, int]], flagged: List[Tuple[int, int]]):
+        """记录一步已经作用在当前状态上的操作"""
+        state = self.state
+        self.steps.append(ReplayStep(action, revealed, flagged, state.mines_remaining, state.game_over,
+                                     state.revealed_safe, state.correct_flags))
+        self.position = len(self.steps)
+        if self.position % self.keyframe_interval == 0:
+            self.keyframes.append(copy_state(self.state))
+
+    def detach(self):
+        """当前状态被外部修改后调用，下次定位时从关键帧重建"""
+        self.position = None
+
+    def seek(self, position: int) -> Optional[List[Tuple[int, int]]]:
+        """把当前状态移动到执行前 position 步之后
+
+        返回状态发生变化的格子；如果是从关键帧重建的，返回None
+        """
+        changed: Optional[List[Tuple[int, int]]] = []
+        if self.position is None or abs(position - self.position) > self.keyframe_interval:
+            keyframe = position // self.keyframe_interval
+            self.state = copy_state(self.keyframes[keyframe])
+            self.position = keyframe * self.keyframe_interval
+            changed = None
+
+        state = self.state
+        while self.position < position:
+            step = self.steps[self.position]
+            for x, y in step.revealed:
+                state.revealed[x][y] = True
+            for x, y in step.flagged:
+                state.flagged[x][y] = True
+            if changed is not None:
+                changed += step.revealed
+                changed += step.flagged
+            self.position += 1
+        while self.position > position:
+            self.position -= 1
+            step = self.steps[self.position]
+            for x, y in step.revealed:
+                state.revealed[x][y] = False
+            for x, y in step.flagged:
+                state.flagged[x][y] = False
+            if changed is not None:
+                changed += step.revealed
+                changed += step.flagged
+
+        previous = self.steps[position - 1] if position else self.keyframes[0]
+        state.mines_remaining = previous.mines_remaining
+        state.game_over = previous.game_over
+        state.revealed_safe = previous.revealed_safe
+        state.correct_flags = previous.correct_flags
+        return changed
+
+
+def apply_action(state: GameState, action: Action) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """在状态上执行一步AI操作，返回新揭开和新标记的格子"""
+    x, y = action.x, action.y
+    revealed = []
+    flagged = []
+    if action.is_flag:
+        if not state.flagged[x][y]:
+            state.flagged[x][y] = True
+            flagged.append((x, y))
+            state.correct_flags += state.mines[x][y]
+        state.mines_remaining -= 1
+    else:
+        revealed = flood_reveal(state.hints, state.revealed, state.flagged, x, y)
+        state.revealed_safe += sum(not state.mines[cx][cy] for cx, cy in revealed)
+        if state.mines[x][y]:
+            state.game_over = True
+    return revealed, flagged
+
+
+def record_solve(state: GameState, start_x: int, start_y: int,
+                 progress: Optional[Callable[[MineSolver], None]] = None,
+                 board: Optional[Board] = None) -> ReplayTimeline:
+    """从state出发用MineSolver求解，并把每步操作记录成回放时间线
+
+    state本身不会被修改。progress在每轮传播后调用，可以抛出异常来放弃求解。
+    给出board时直接用它的提示，不再从state.mines重新计算。
+    """
+    solver = MineSolver(state.mines if board is None else board)
+    solver.progress = progress
+
+    timeline = ReplayTimeline(state)
+    # 边求解边记录，求解器不用保存完整的操作列表
+    for action, _ in solver.iter_solve(start_x, start_y):
+        revealed, flagged = apply_action(timeline.state, action)
+        timeline.append(action, revealed, flagged)
+    # 回到第0步，和开始求解时的棋盘一致，之后的回放只需重绘变化的格子
+    timeline.seek(0)
+    return timeline
+
+
+class Game:
+    """一局扫雷的规则：放雷、揭开、插旗和胜负判断
+
+    当前局面保存在state中，回放时直接换成时间线的状态。所有计数都是增量维护的，
+    胜负判断是常数时间。
+    """
+
+    def __init__(self, width: int, height: int, mines_count: int):
+        self.width = width
+        self.height = height
+        self.mines_count = mines_count
+        self.safe_total = width * height - mines_count  # 获胜需要揭开的格子数
+        self.started = False  # 是否已经放置地雷
+        self.board: Optional[Board] = None  # 放雷后的棋盘，提示只在这里计算一次
+        self.state = GameState(
+            mines=[[0] * height for _ in range(width)],
+            hints=[[0] * height for _ in range(width)],
+            revealed=[[False] * height for _ in range(width)],
+            flagged=[[False] * height for _ in range(width)],
+            mines_remaining=mines_count,
+            game_over=False
+        )
+
+    def copy(self) -> 'Game':
+        """复制一局游戏，地雷和提示共享"""
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game.state = copy_state(self.state)
+        return game
+
+    @property
+    def won(self) -> bool:
+        """所有非地雷格子都已揭开"""
+        return self.state.revealed_safe == self.safe_total
+
+    def place_mines(self, first_x: int, first_y: int, board: Optional[Board] = None):
+        """放置地雷，没有给出棋盘时现场生成一个不用猜的棋盘"""
+        if board is None:
+            board = generate_safe_board(self.mines_count, self.width, self.height, first_x, first_y)
+        self.board = board
+        state = self.state
+        mines = state.mines = board.layout()
+        state.hints = board.hint_layout()
+        # 放雷之前插的旗子现在才知道对不对
+        state.correct_flags = count_correct_flags(mines, state.flagged)
+        self.started = True
+
+    def reveal(self, x: int, y: int) -> List[Tuple[int, int]]:
+        """揭开一个格子，返回新揭开的格子"""
+        state = self.state
+        cells = flood_reveal(state.hints, state.revealed, state.flagged, x, y)
+        state.revealed_safe += sum(not state.mines[cx][cy] for cx, cy in cells)
+        return cells
+
+    def click(self, x: int, y: int) -> List[Tuple[int, int]]:
+        """左键点击，返回新揭开的格子
+
+        第一次点击时放置地雷。踩到地雷或者获胜后game_over为True，用won区分。
+        """
+        state = self.state
+        if state.game_over or state.flagged[x][y]:
+            return []
+        if not self.started:
+            self.place_mines(x, y)
+
+        if state.mines[x][y]:
+            state.game_over = True
+            return []
+
+        cells = self.reveal(x, y)
+        if self.won:
+            state.game_over = True
+        return cells
+
+    def toggle_flag(self, x: int, y: int) -> bool:
+        """右键插旗或取消插旗，返回是否有变化"""
+        state = self.state
+        if state.game_over or state.revealed[x][y]:
+            return False
+
+        flagged = not state.flagged[x][y]
+        state.flagged[x][y] = flagged
+        state.mines_remaining += -1 if flagged else 1
+        if state.mines[x][y]:
+            state.correct_flags += 1 if flagged else -1
+        return True
+
+    def solve(self, start_x: int, start_y: int,
+              progress: Optional[Callable[[MineSolver], None]] = None) -> ReplayTimeline:
+        """从当前局面开始让AI求解，返回记录了每步操作的时间线，当前局面不变"""
+        if not self.started:
+            self.place_mines(start_x, start_y)
+        return record_solve(self.state, start_x, start_y, progress, self.board)
@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from board import Board, pack_bits, unpack_bits
+from solver import generate_safe_board, generate_safe_mines
+
+# (width, height, mines, canonical first-click x, canonical first-click y)
+PoolKey = Tuple[int, int, int, int, int]
+
+
+def position_class(width: int, height: int, x: int, y: int) -> Tuple[int, int, bool, bool]:
+    """Fold a first click into the top-left quadrant.
+
+    Mirroring a board keeps it solvable, so every click shares its layouts with the
+    mirrored clicks. Returns the canonical click and whether x and y were mirrored.
+    """
+    flip_x = x > width - 1 - x
+    flip_y = y > height - 1 - y
+    return (width - 1 - x if flip_x else x), (height - 1 - y if flip_y else y), flip_x, flip_y
+
+
+class BoardPool:
+    """Pre-generated no-guess layouts, kept topped up by a background thread.
+
+    Layouts are stored bit-packed per (width, height, mines, first-click class),
+    without their hints, so a pooled board computes its hints once when it is taken.
+    Only a live generation hands over the Board the generator already solved. Each key holds at most ``per_key`` boards, only the ``max_keys`` most recently
+    requested keys are refilled, and the least recently used keys are evicted once
+    more than ``max_boards`` boards are stored.
+    """
+
+    def __init__(self, per_key: int = 4, max_keys: int = 4, max_boards: int = 32):
+        self.per_key = per_key
+        self.max_keys = max_keys
+        self.max_boards = max_boards
+        self.boards: 'OrderedDict[PoolKey, Deque[bytes]]' = OrderedDict()
+        self.wanted: 'OrderedDict[PoolKey, None]' = OrderedDict()
+        self.count = 0  # Boards stored over all keys
+        self.live: Dict[PoolKey, int] = {}  # Keys being generated live by take, not refilled meanwhile
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.closed = False
+
+    def reserve(self, width: int, height: int, mines: int, x: int, y: int) -> PoolKey:
+        """Ask the background worker to keep boards ready for this first click."""
+        cx, cy, _, _ = position_class(width, height, x, y)
+        key = (width, height, mines, cx, cy)
+        with self.condition:
+            self.wanted[key] = None
+            self.wanted.move_to_end(key)
+            while len(self.wanted) > self.max_keys:
+                self.wanted.popitem(last=False)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._refill, name='BoardPool', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return key
+
+    def take_ready(self, width: int, height: int, mines: int, x: int, y: int) -> Optional[Board]:
+        """Pop a ready board for this first click, or return None at once if there is none.
+
+        The board is rebuilt from its bit-packed layout, which computes its hints.
+        """
+        cx, cy, flip_x, flip_y = position_class(width, height, x, y)
+        key = self.reserve(width, height, mines, x, y)
+        with self.condition:
+            boards = self.boards.get(key)
+            if not boards:
+                return None
+            data = boards.popleft()
+            self.count -= 1
+            self.boards.move_to_end(key)
+            self.condition.notify()
+
+        layout = unpack_bits(data, width, height)
+        if flip_x:
+            layout.reverse()
+        if flip_y:
+            for column in layout:
+                column.reverse()
+        return Board.from_layout(layout)
+
+    def take(self, width: int, height: int, mines: int, x: int, y: int,
+             progress: Optional[Callable[[int], None]] = None) -> Board:
+        """Pop a ready board for this first click, or generate one live if there is none.
+
+        ``progress`` is passed on to ``generate_safe_board`` for a live generation.
+        The background worker leaves the key alone until the live generation is over,
+        so the two don't compete for the same board.
+        """
+        cx, cy, _, _ = position_class(width, height, x, y)
+        key = (width, height, mines, cx, cy)
+        # Claimed before looking, so a miss can't wake the worker on this key
+        with self.condition:
+            self.live[key] = self.live.get(key, 0) + 1
+        try:
+            board = self.take_ready(width, height, mines, x, y)
+            if board is None:
+                board = generate_safe_board(mines, width, height, x, y, progress=progress)
+            return board
+        finally:
+            with self.condition:
+                self.live[key] -= 1
+                if not self.live[key]:
+                    del self.live[key]
+                self.condition.notify()
+
+    def put(self, key: PoolKey, layout: List[List[int]]):
+        """Store a canonical layout for ``key``, evicting the oldest boards over the caps."""
+        with self.condition:
+            boards = self.boards.setdefault(key, deque())
+            self.boards.move_to_end(key)
+            if len(boards) >= self.per_key:
+                return
+            boards.append(pack_bits(layout))
+            self.count += 1
+            while self.count > self.max_boards:
+                old_key, old_boards = next(iter(self.boards.items()))
+                old_boards.popleft()
+                self.count -= 1
+                if not old_boards:
+                    del self.boards[old_key]
+
+    def close(self):
+        """Stop the background worker."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def _next_key(self) -> Optional[PoolKey]:
+        """Most recently requested key that is missing boards."""
+        for key in reversed(self.wanted):
+            if key not in self.live and len(self.boards.get(key, ())) < self.per_key:
+                return key
+        return None
+
+    def _refill(self):
+        while True:
+            with self.condition:
+                key = self._next_key()
+                while key is None and not self.closed:
+                    self.condition.wait()
+                    key = self._next_key()
+                if self.closed:
+                    return
+
+            width, height, mines, x, y = key
+            self.put(key, generate_safe_mines(mines, width, height, x, y))
@@ -1,6 +1,15 @@
+import multiprocessing
 import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from math import comb, gcd
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from board import Board, Grid
+from stats import ALL_MINES, ALL_SAFE, COMPONENTS, LINEAR, SUBSET, Stats
 
 
 @dataclass
@@ -12,68 +21,680 @@ class Action:
 
 @dataclass
 class Clue:
-    pos: Tuple[int, int]  # Position of the clue cell
-    unknowns: List[Tuple[int, int]]  # List of unknown neighboring cells
+    pos: int  # Flat index of the clue cell
+    unknowns: List[int]  # Flat indices of the unknown neighboring cells
     mines: int  # Number of mines in the unknown neighbors
 
 
+@dataclass
+class SolveResult:
+    solvable: bool  # Every cell was resolved without guessing
+    reason: str  # Why the solver stopped, one of the stop reasons below
+    steps: int  # Number of clue checks performed
+    resolved: int  # Number of cells resolved when the solver stopped
+
+
+# Cell values of MineSolver.assignments
+SAFE = 0
+MINE = 1
+UNKNOWN = 2
+BORDER = 3
+ON_BOARD = bytes.maketrans(bytes([SAFE, MINE, UNKNOWN, BORDER]), bytes([1, 1, 1, 0]))
+
+# Stop reasons of MineSolver.check_solvable
+SOLVED = 'solved'  # Every cell was resolved
+STUCK = 'stuck'  # Propagation reached a fixed point with unresolved cells
+FIFTY_FIFTY = 'fifty_fifty'  # A mine and a safe cell can be swapped without changing any clue
+STEP_BUDGET = 'step_budget'
+TIME_BUDGET = 'time_budget'
+
+COMPONENT_LIMIT = 32  # Largest group of frontier cells that is enumerated
+REPAIR_MOVES = 4  # Mines moved by one repair of a stuck board
+
+# Inference backends of MineSolver, both compare pairs of overlapping clues during propagation
+SUBSET_INFERENCE = 'subset'  # Only the pairwise subset rule
+LINEAR_INFERENCE = 'linear'  # Also Gaussian elimination over all frontier clues at a fixed point
+INFERENCE_BACKENDS = (SUBSET_INFERENCE, LINEAR_INFERENCE)
+
+# Mine count of a frontier group -> (number of assignments, per-cell number of assignments with a mine)
+Distribution = Dict[int, Tuple[int, List[int]]]
+Group = Tuple[List[int], Distribution]  # Cells of a frontier group and their distribution
+
+
 class MineSolver:
-    def __init__(self, mines: List[List[int]]):
-        self.width = len(mines)
-        self.height = len(mines[0]) if self.width > 0 else 0
-        self.mines = mines
+    def __init__(self, mines: Union[Board, List[List[int]]], incremental: bool = True,
+                 global_inference: bool = True, stats: Optional[Stats] = None,
+                 inference: str = SUBSET_INFERENCE):
+        if inference not in INFERENCE_BACKENDS:
+            raise ValueError(f'unknown inference backend {inference!r}')
+        # A Board is used as it is, its mines and hints are only read
+        self.board = mines if isinstance(mines, Board) else Board.from_layout(mines)
+        self.grid = self.board.grid
+        self.width = self.grid.width
+        self.height = self.grid.height
+        self.mines = self.board.mines
+        self.hints = self.board.hints
         self.actions: List[Action] = []  # Sequence of actions
-        self.hints = [
-            [sum(mines[nx][ny] for nx, ny in self.get_neighbors(x, y)) for y in range(self.height)]
-            for x in range(self.width)]
-        # Variable assignments: (x, y) -> 0 (safe) or 1 (mine)
-        self.assignments: Dict[Tuple[int, int], int] = {}
-
-    def get_neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
-        """Get the coordinates of all neighboring cells."""
-        neighbors = []
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.width and 0 <= ny < self.height:
-                    neighbors.append((nx, ny))
-        return neighbors
+        # Variable assignments: flat index -> SAFE, MINE or UNKNOWN, the border cells are BORDER
+        self.assignments = bytearray([BORDER]) * self.grid.size
+        for x in range(self.width):
+            start = self.grid.index(x, 0)
+            self.assignments[start:start + self.height] = bytes([UNKNOWN]) * self.height
+        self.inference = inference
+        # Counts for the global mine-count constraint
+        self.global_inference = global_inference
+        self.total_mines = self.mines.count(1)
+        self.mines_found = 0
+        self.unknown_count = self.width * self.height
+        self.group_cache: Dict[FrozenSet, Group] = {}  # Frontier groups enumerated by the last query
+        # Incremental mode keeps the clues alive between deductions and only
+        # re-checks the ones queued because a neighboring cell was assigned
+        self.incremental = incremental
+        self.clues: Dict[int, Clue] = {}
+        self.worklist: Deque[int] = deque()
+        self.queued: Set[int] = set()
+        # Cell -> positions of the live clues covering it, and each clue's cached unknown set
+        self.cell_clues: Dict[int, Set[int]] = {}
+        self.unknown_sets: Dict[int, FrozenSet[int]] = {}
+        self.rounds = 0  # Number of propagation rounds (worklist rounds or full passes) processed
+        self.steps = 0  # Number of clue checks performed
+        # Early-abort settings, see check_solvable
+        self.max_steps: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.stop_reason: Optional[str] = None
+        # Called with the solver after every propagation round, it may raise to abandon the solve
+        self.progress: Optional[Callable[['MineSolver'], None]] = None
+        self.stats = stats  # Opt-in instrumentation, None costs a check per round and per deduction
 
-    def get_unknown_neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
+    def get_unknown_neighbors(self, i: int) -> List[int]:
         """Get neighboring cells that are still unknown."""
-        return [(nx, ny) for nx, ny in self.get_neighbors(x, y) if (nx, ny) not in self.assignments]
+        assignments = self.assignments
+        return [i + d for d in self.grid.offsets if assignments[i + d] == UNKNOWN]
+
+    def make_clue(self, i: int) -> Optional[Clue]:
+        """Build the constraint of a safe cell, or None if it has no unknown neighbors."""
+        unknown_neighbors = self.get_unknown_neighbors(i)
+        if not unknown_neighbors:
+            return None
+        assignments = self.assignments
+        mine_count = self.hints[i] - sum(1 for d in self.grid.offsets if assignments[i + d] == MINE)
+        return Clue(i, unknown_neighbors, mine_count)
 
     def get_clues(self) -> List[Clue]:
         """Build initial constraints based on the current known cells."""
         clues = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if (x, y) in self.assignments and self.assignments[(x, y)] == 0:
-                    unknown_neighbors = self.get_unknown_neighbors(x, y)
-                    if not unknown_neighbors: continue
-                    mine_count = self.hints[x][y] - sum(1 for nx, ny in self.get_neighbors(x, y) if
-                                                        self.assignments.get((nx, ny)) == 1)
-                    clues.append(Clue((x, y), unknown_neighbors, mine_count))
+        for i in self.grid.cells():
+            if self.assignments[i] == SAFE:
+                clue = self.make_clue(i)
+                if clue is not None:
+                    clues.append(clue)
         return clues
 
+    def assign(self, i: int, value: int) -> bool:
+        """Record a deduction, returning False if the cell was already known."""
+        if self.assignments[i] != UNKNOWN:
+            return False
+        self.assignments[i] = value
+        self.unknown_count -= 1
+        self.mines_found += value
+        x, y = self.grid.coords(i)
+        self.actions.append(Action(x, y, value == MINE))
+        if self.incremental:
+            self.update_clues(i, value)
+        return True
+
+    def assign_all(self, cells, value: int) -> bool:
+        """Assign the same value to several cells."""
+        progress = False
+        for i in cells:
+            if self.assign(i, value):
+                progress = True
+        return progress
+
+    def apply_rule(self, rule: str, cells, value: int) -> bool:
+        """Assign the cells a deduction rule resolved, counting them per rule when instrumented."""
+        if self.stats is None:
+            return self.assign_all(cells, value)
+        unknown_count = self.unknown_count
+        progress = self.assign_all(cells, value)
+        self.stats.deductions[rule] += unknown_count - self.unknown_count
+        return progress
+
+    def enqueue(self, pos: int):
+        """Queue a live clue to be re-checked in the next round."""
+        if pos not in self.queued:
+            self.queued.add(pos)
+            self.worklist.append(pos)
+
+    def update_clues(self, i: int, value: int):
+        """Remove a newly assigned cell from the clues covering it and re-queue them."""
+        for pos in self.cell_clues.pop(i, ()):
+            clue = self.clues[pos]
+            clue.unknowns.remove(i)
+            clue.mines -= value
+            self.unknown_sets.pop(pos, None)
+            if clue.unknowns:
+                self.enqueue(pos)
+            else:
+                del self.clues[pos]
+
+        # A safe cell becomes a new clue
+        if value == SAFE:
+            clue = self.make_clue(i)
+            if clue is not None:
+                self.clues[i] = clue
+                for cell in clue.unknowns:
+                    self.cell_clues.setdefault(cell, set()).add(i)
+                self.enqueue(i)
+
+    def find_fifty_fifty(self, start: int) -> bool:
+        """Look for a mine and a safe cell that are neighbors of exactly the same safe cells.
+
+        Swapping the two changes no hint a player can ever see without revealing one of
+        them, so no sound deduction can tell them apart and the board needs a guess.
+        Only the starting cell is revealed for free, so it can't be the safe one.
+        """
+        grid = self.grid
+        mines = self.mines
+        offsets = grid.offsets
+        near = frozenset(offsets) | {0}  # Index differences of adjacent or equal cells
+        # Safe cells, and the number of safe neighbors of every cell, all lanes at once
+        on_board = int.from_bytes(self.assignments.translate(ON_BOARD), 'little')
+        safe = (on_board - int.from_bytes(mines, 'little')).to_bytes(grid.size, 'little')
+        safe_counts = grid.compute_hints(safe)
+
+        a = mines.find(1)
+        while a >= 0:
+            count = safe_counts[a]
+            if count:
+                # The safe cell must touch every safe neighbor of the mine, so also the first one
+                first = next(a + d for d in offsets if safe[a + d])
+                candidates = [first + d for d in offsets]
+                candidates.append(first)
+            else:
+                stride = grid.stride
+                candidates = [a + dx * stride + dy for dx in range(-2, 3) for dy in range(-2, 3)]
+            for b in candidates:
+                if (0 <= b < grid.size and safe[b] and b != start and
+                        safe_counts[b] == count - (b - a in near)):
+                    safe_a = {a + d for d in offsets if safe[a + d]}
+                    safe_a.discard(b)
+                    if safe_a == {b + d for d in offsets if safe[b + d]}:
+                        return True
+            a = mines.find(1, a + 1)
+        return False
+
+    def unknown_set(self, clue: Clue) -> FrozenSet[int]:
+        """Frozen unknowns of a live clue, cached until one of them is assigned."""
+        unknowns = self.unknown_sets.get(clue.pos)
+        if unknowns is None:
+            unknowns = self.unknown_sets[clue.pos] = frozenset(clue.unknowns)
+        return unknowns
+
     def solve(self, start_x: int, start_y: int) -> List[Action]:
         """Solve the Minesweeper puzzle using a custom CDCL-inspired solver."""
         # Initialize by marking the starting cell as safe
-        self.assignments[(start_x, start_y)] = 0  # 0 represents safe
-        self.actions.append(Action(start_x, start_y, False))
+        self.assign(self.grid.index(start_x, start_y), SAFE)
+        self.deduce()
+        return self.actions
 
-        # Iteratively apply constraint propagation
-        while self.propagate_constraints():
+    def iter_solve(self, start_x: int, start_y: int, keep_actions: bool = False) -> Iterator[Tuple[Action, int]]:
+        """Solve like ``solve``, yielding every action with the round that deduced it.
+
+        Actions are yielded as soon as their round ends, so a consumer can start using
+        them at once and stop early by closing the generator. Actions of the global
+        stage carry the number of the round it followed, the first click is round 0.
+        Yielded actions are dropped from ``actions`` unless ``keep_actions`` is set.
+        """
+        self.assign(self.grid.index(start_x, start_y), SAFE)
+        sent = 0
+        for round_number in self.deduce_rounds(initial=True):
+            actions = self.actions
+            if keep_actions:
+                new, sent = actions[sent:], len(actions)
+            else:
+                new = actions[:]
+                actions.clear()
+            for action in new:
+                yield action, round_number
+
+    def reveal(self, x: int, y: int) -> List[Action]:
+        """Open a cell from outside the solver, such as a guess, and deduce what follows.
+
+        Returns the actions this added. Raises ValueError if the cell is a mine.
+        """
+        i = self.grid.index(x, y)
+        if self.mines[i]:
+            raise ValueError(f'({x}, {y}) is a mine')
+        count = len(self.actions)
+        self.assign(i, SAFE)
+        self.deduce()
+        return self.actions[count:]
+
+    def deduce(self):
+        """Propagate until nothing more can be deduced."""
+        for _ in self.deduce_rounds():
             pass
 
-        return self.actions
+    def deduce_rounds(self, initial: bool = False) -> Iterator[int]:
+        """Propagate like ``deduce``, yielding the round number after every round.
+
+        The global stage yields again with the number of the round it followed. With
+        ``initial`` the current round number is also yielded before propagating.
+        """
+        if initial:
+            yield self.rounds
+        propagate = self.propagate_worklist if self.incremental else self.propagate_constraints
+        stats = self.stats
+        while True:
+            while True:
+                if stats is not None:
+                    start, steps = time.perf_counter(), self.steps
+                work_left = propagate()
+                if stats is not None:
+                    stats.record_pass(self.steps - steps, time.perf_counter() - start)
+                if self.progress is not None:
+                    self.progress(self)
+                yield self.rounds
+                if not work_left or self.stop_reason is not None:
+                    break
+            if self.stop_reason is not None:
+                break
+            # Once the local rules are exhausted, try the stronger and slower stages
+            if self.inference == LINEAR_INFERENCE and self.infer_linear():
+                yield self.rounds
+                continue
+            if not self.global_inference or not self.infer_global():
+                break
+            yield self.rounds
+
+    def infer_global(self) -> bool:
+        """Run infer_components, timing it and counting its deductions when instrumented."""
+        if self.stats is None:
+            return self.infer_components()
+        unknown_count = self.unknown_count
+        with self.stats.timer(COMPONENTS):
+            progress = self.infer_components()
+        self.stats.deductions[COMPONENTS] += unknown_count - self.unknown_count
+        return progress
+
+    def check_solvable(self, start_x: int, start_y: int, max_steps: Optional[int] = None,
+                       time_limit: Optional[float] = None) -> SolveResult:
+        """Solve only as far as needed to tell whether the board can be solved without guessing.
+
+        Rejects the board before propagating if it contains a fifty-fifty, and otherwise
+        stops when ``max_steps`` clue checks or ``time_limit`` seconds are used up.
+        Budgets only apply to the incremental engine.
+        """
+        self.max_steps = max_steps
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        if self.stats is None:
+            fifty_fifty = self.find_fifty_fifty(self.grid.index(start_x, start_y))
+        else:
+            with self.stats.timer(FIFTY_FIFTY):
+                fifty_fifty = self.find_fifty_fifty(self.grid.index(start_x, start_y))
+        if fifty_fifty:
+            self.stop_reason = FIFTY_FIFTY
+        else:
+            self.solve(start_x, start_y)
+        return self.solve_result()
+
+    def solve_result(self) -> SolveResult:
+        """Outcome of the deductions made so far."""
+        resolved = self.width * self.height - self.unknown_count
+        if resolved == self.width * self.height:
+            reason = SOLVED
+        elif self.stop_reason is not None:
+            reason = self.stop_reason
+        else:
+            reason = STUCK
+        return SolveResult(reason == SOLVED, reason, self.steps, resolved)
+
+    def resume(self, board: Board, changed: Iterable[int]) -> 'MineSolver':
+        """Start a solver on a board that differs from this one only at the ``changed`` cells.
+
+        Deductions made before the first one that resolved a changed cell, or revealed
+        a clue whose hint may have changed, only used facts that still hold on the new
+        board. They are replayed without checking any clue, and the next ``deduce``
+        continues from the clues they left. Needs every action, as kept by ``solve``.
+        """
+        grid = self.grid
+        changed = set(changed)
+        touched = {i + d for i in changed for d in grid.offsets}
+        solver = MineSolver(board, self.incremental, self.global_inference, self.stats, self.inference)
+        solver.progress = self.progress
+        for action in self.actions:
+            i = grid.index(action.x, action.y)
+            if i in changed or (not action.is_flag and i in touched):
+                break
+            solver.assign(i, MINE if action.is_flag else SAFE)
+        return solver
+
+    def propagate_worklist(self) -> bool:
+        """Re-check the clues queued by the previous round, return True while work remains."""
+        self.rounds += 1
+        for _ in range(len(self.worklist)):
+            if self.stop_reason is not None:
+                return False
+            pos = self.worklist.popleft()
+            self.queued.discard(pos)
+            clue = self.clues.get(pos)
+            if clue is None:
+                continue
+            self.steps += 1
+            self.check_clue(clue)
+            if self.max_steps is not None and self.steps >= self.max_steps:
+                self.stop_reason = STEP_BUDGET
+            elif self.deadline is not None and self.steps % 64 == 0 and time.perf_counter() > self.deadline:
+                self.stop_reason = TIME_BUDGET
+        return bool(self.worklist)
+
+    def check_clue(self, clue: Clue) -> bool:
+        """Apply the local rules to a single live clue."""
+        unknowns = clue.unknowns
+        if clue.mines == len(unknowns):
+            return self.apply_rule(ALL_MINES, list(unknowns), MINE)
+        if clue.mines == 0:
+            return self.apply_rule(ALL_SAFE, list(unknowns), SAFE)
+
+        # Subset inference in both directions, since either clue may be the one that changed.
+        # Only clues sharing a cell with this one can be a subset or superset of it.
+        # Any deduction re-queues this clue, so stop at the first one instead of using stale sets.
+        superset = self.unknown_set(clue)
+        candidates = {pos for cell in unknowns for pos in self.cell_clues[cell]}
+        candidates.discard(clue.pos)
+        for pos in candidates:
+            other = self.clues[pos]
+            other_set = self.unknown_set(other)
+            if other_set < superset:
+                if self.apply_difference(superset - other_set, clue.mines - other.mines):
+                    return True
+            elif superset < other_set:
+                if self.apply_difference(other_set - superset, other.mines - clue.mines):
+                    return True
+        return False
+
+    def apply_difference(self, difference: Set[int], mine_difference: int) -> bool:
+        """Resolve the cells a superset clue has beyond one of its subsets."""
+        if mine_difference == len(difference):
+            return self.apply_rule(SUBSET, difference, MINE)
+        if mine_difference == 0:
+            return self.apply_rule(SUBSET, difference, SAFE)
+        return False
+
+    @staticmethod
+    def reduce_component(cells: List[int], clues: List[Clue]) -> List[Tuple[Dict[int, int], int]]:
+        """Row-reduce the clues of a frontier group to reduced row echelon form.
+
+        Each row maps cells to integer coefficients and has the mine count as its
+        right-hand side. Rows are scaled by integers and divided by their gcd instead
+        of using fractions. Pivots follow the breadth-first order of the cells, which
+        keeps the banded clue matrix from filling in.
+        """
+        rows = [[{cell: 1 for cell in clue.unknowns}, clue.mines] for clue in clues]
+        pending = rows[:]  # Rows that have no pivot yet
+        for cell in cells:
+            pivot = next((row for row in pending if cell in row[0]), None)
+            if pivot is None:
+                continue
+            pending.remove(pivot)
+            pivot_coefficients, pivot_total = pivot
+            p = pivot_coefficients[cell]
+            for row in rows:
+                c = row[0].get(cell)
+                if c is None or row is pivot:
+                    continue
+                # row * (p / g) - pivot * (c / g) cancels the cell
+                g = gcd(p, c)
+                a, b = p // g, c // g
+                combined = {key: value * a for key, value in row[0].items()}
+                for key, value in pivot_coefficients.items():
+                    combined[key] = combined.get(key, 0) - value * b
+                coefficients = {key: value for key, value in combined.items() if value}
+                total = row[1] * a - pivot_total * b
+                divisor = gcd(total, *coefficients.values())
+                if divisor > 1:
+                    coefficients = {key: value // divisor for key, value in coefficients.items()}
+                    total //= divisor
+                row[0], row[1] = coefficients, total
+        return [(coefficients, total) for coefficients, total in rows if coefficients]
+
+    def infer_linear(self) -> bool:
+        """Resolve cells from the 0/1 bounds of the row-reduced frontier clues.
+
+        A row's left side lies between the sum of its negative and the sum of its
+        positive coefficients. When the right side meets one of these bounds, every
+        cell in the row is forced to the value reaching it.
+        """
+        clues = list(self.clues.values()) if self.incremental else self.get_clues()
+        forced: Dict[int, int] = {}
+        for cells, component_clues in self.frontier_components(clues):
+            for coefficients, total in self.reduce_component(cells, component_clues):
+                high = sum(value for value in coefficients.values() if value > 0)
+                low = sum(value for value in coefficients.values() if value < 0)
+                if total == high:
+                    for cell, value in coefficients.items():
+                        forced[cell] = MINE if value > 0 else SAFE
+                elif total == low:
+                    for cell, value in coefficients.items():
+                        forced[cell] = SAFE if value > 0 else MINE
+
+        mines = [cell for cell, value in forced.items() if value == MINE]
+        safe = [cell for cell, value in forced.items() if value == SAFE]
+        progress = self.apply_rule(LINEAR, mines, MINE)
+        return self.apply_rule(LINEAR, safe, SAFE) or progress
+
+    def frontier_components(self, clues: List[Clue]) -> List[Tuple[List[int], List[Clue]]]:
+        """Split the unknown cells covered by clues into groups that share no clue.
+
+        The cells of each group are in breadth-first order, so the clues being
+        enumerated at any one time stay few.
+        """
+        cell_clues: Dict[int, List[Clue]] = {}
+        for clue in clues:
+            for cell in clue.unknowns:
+                cell_clues.setdefault(cell, []).append(clue)
+
+        components = []
+        seen: Set[int] = set()
+        for start in cell_clues:
+            if start in seen:
+                continue
+            seen.add(start)
+            cells = [start]
+            component_clues: Dict[int, Clue] = {}
+            for cell in cells:  # Grows while it is walked
+                for clue in cell_clues[cell]:
+                    if clue.pos in component_clues:
+                        continue
+                    component_clues[clue.pos] = clue
+                    for other in clue.unknowns:
+                        if other not in seen:
+                            seen.add(other)
+                            cells.append(other)
+            components.append((cells, list(component_clues.values())))
+        return components
+
+    @staticmethod
+    def enumerate_component(cells: List[int], clues: List[Clue]) -> Distribution:
+        """Count the assignments of a frontier group that satisfy all of its clues.
+
+        Backtracks over the cells in order, memoized on the mines each clue still needs.
+        """
+        position = {cell: p for p, cell in enumerate(cells)}
+        # Per position: the clues covering that cell and how many of their cells come after it
+        covering: List[List[Tuple[int, int]]] = [[] for _ in cells]
+        for ci, clue in enumerate(clues):
+            positions = sorted(position[cell] for cell in clue.unknowns)
+            for j, p in enumerate(positions):
+                covering[p].append((ci, len(positions) - j - 1))
+
+        memo: Dict[Tuple[int, Tuple[int, ...]], Distribution] = {}
+
+        def count(p: int, need: Tuple[int, ...]) -> Distribution:
+            if p == len(cells):
+                return {0: (1, [])}
+            key = (p, need)
+            if key in memo:
+                return memo[key]
+            result: Distribution = {}
+            for value in (0, 1):
+                next_need = list(need)
+                for ci, after in covering[p]:
+                    left = next_need[ci] - value
+                    if left < 0 or left > after:
+                        break
+                    next_need[ci] = left
+                else:
+                    for k, (ways, mine_ways) in count(p + 1, tuple(next_need)).items():
+                        cell_ways = [ways * value] + mine_ways
+                        if k + value in result:
+                            total, totals = result[k + value]
+                            result[k + value] = (total + ways, [a + b for a, b in zip(totals, cell_ways)])
+                        else:
+                            result[k + value] = (ways, cell_ways)
+            memo[key] = result
+            return result
+
+        return count(0, tuple(clue.mines for clue in clues))
+
+    def group_distributions(self, limit: Optional[int]) -> Tuple[List[Group], bool]:
+        """Enumerate the frontier groups of at most ``limit`` cells.
+
+        Groups are cached by their clues, so a group no new assignment touched since
+        the previous call is not enumerated again. Groups over the limit keep their
+        cached entry for the next unlimited call. Returns the groups and whether none
+        was left out.
+        """
+        clues = list(self.clues.values()) if self.incremental else self.get_clues()
+        cache: Dict[FrozenSet, Group] = {}
+        groups = []
+        exact = True
+        for cells, component_clues in self.frontier_components(clues):
+            key = frozenset((clue.mines, frozenset(clue.unknowns)) for clue in component_clues)
+            group = self.group_cache.get(key)
+            if limit is not None and len(cells) > limit:
+                exact = False
+                if group is not None:
+                    cache[key] = group
+                continue
+            if group is None:
+                group = (cells, self.enumerate_component(cells, component_clues))
+            cache[key] = group
+            groups.append(group)
+        self.group_cache = cache
+        return groups, exact
+
+    def weigh_groups(self, groups: List[Group]) -> Tuple[int, Dict[int, int], int, int]:
+        """Weigh the frontier groups against each other under the remaining mine count.
+
+        Returns the number of ways to complete the board, the number of those with a
+        mine on each frontier cell, the number of cells no clue covers, and the number
+        of ways with a mine on any one of those cells.
+        """
+        # Cells no clue covers share the mines the groups leave over
+        remaining = self.total_mines - self.mines_found
+        sea = self.unknown_count - sum(len(cells) for cells, _ in groups)
+
+        def sea_ways(k: int) -> int:
+            return comb(sea, remaining - k) if 0 <= remaining - k <= sea else 0
+
+        def convolve(a: Dict[int, int], b: Dict[int, int]) -> Dict[int, int]:
+            result: Dict[int, int] = {}
+            for ka, wa in a.items():
+                for kb, wb in b.items():
+                    result[ka + kb] = result.get(ka + kb, 0) + wa * wb
+            return result
+
+        # Ways to place k mines in the groups before and after each group
+        totals = [{k: ways for k, (ways, _) in distribution.items()} for _, distribution in groups]
+        prefix = [{0: 1}]
+        for total in totals:
+            prefix.append(convolve(prefix[-1], total))
+        suffix = [{0: 1}]
+        for total in reversed(totals):
+            suffix.append(convolve(suffix[-1], total))
+        suffix.reverse()
+        ways = sum(w * sea_ways(k) for k, w in prefix[-1].items())
+
+        mine_ways: Dict[int, int] = {}
+        for i, (cells, distribution) in enumerate(groups):
+            others = convolve(prefix[i], suffix[i + 1])
+            # Weight of each mine count of this group, given every way to complete the board
+            weights = {k: sum(w * sea_ways(k + j) for j, w in others.items()) for k in distribution}
+            for p, cell in enumerate(cells):
+                mine_ways[cell] = sum(cell_ways[p] * weights[k] for k, (_, cell_ways) in distribution.items())
+
+        sea_mine_ways = sum(w * comb(sea - 1, remaining - k - 1) for k, w in prefix[-1].items()
+                            if 0 <= remaining - k - 1 <= sea - 1)
+        return ways, mine_ways, sea, sea_mine_ways
+
+    def infer_components(self) -> bool:
+        """Resolve cells by enumerating every assignment consistent with the clues.
+
+        Each group of frontier cells is enumerated on its own, and the remaining mine
+        count ties the groups and the cells no clue covers together. If a group is too
+        large to enumerate, the other groups are only checked on their own.
+        """
+        groups, exact = self.group_distributions(COMPONENT_LIMIT)
+        progress = False
+        if not exact:
+            for cells, distribution in groups:
+                ways = sum(total for total, _ in distribution.values())
+                for p, cell in enumerate(cells):
+                    cell_ways = sum(totals[p] for _, totals in distribution.values())
+                    if cell_ways == 0 or cell_ways == ways:
+                        if self.assign(cell, MINE if cell_ways else SAFE):
+                            progress = True
+            return progress
+
+        ways, mine_ways, sea, sea_mine_ways = self.weigh_groups(groups)
+        for cell, cell_ways in mine_ways.items():
+            if cell_ways == 0 or cell_ways == ways:
+                if self.assign(cell, MINE if cell_ways else SAFE):
+                    progress = True
+        if sea and (sea_mine_ways == 0 or sea_mine_ways == ways):
+            sea_cells = [i for i in self.grid.cells() if self.assignments[i] == UNKNOWN and i not in mine_ways]
+            if self.assign_all(sea_cells, MINE if sea_mine_ways else SAFE):
+                progress = True
+        return progress
+
+    def probabilities(self) -> List[List[float]]:
+        """Chance of a mine on every cell given what the solver knows, as grid[x][y].
+
+        Every frontier group is enumerated however large it is. Groups are cached, so
+        calling this after each move only counts the groups the move changed.
+        """
+        groups, _ = self.group_distributions(None)
+        ways, mine_ways, sea, sea_mine_ways = self.weigh_groups(groups)
+        sea_chance = sea_mine_ways / ways if sea else 0.0
+        chances = []
+        for x in range(self.width):
+            column = []
+            for i in range(self.grid.index(x, 0), self.grid.index(x, 0) + self.height):
+                value = self.assignments[i]
+                if value != UNKNOWN:
+                    column.append(float(value))
+                elif i in mine_ways:
+                    column.append(mine_ways[i] / ways)
+                else:
+                    column.append(sea_chance)
+            chances.append(column)
+        return chances
 
     def propagate_constraints(self) -> bool:
         """Propagate constraints and deduce new safe cells or mines."""
         progress = False
         constraints = self.get_clues()
+        self.rounds += 1
+        self.steps += len(constraints)
+
+        # Index the clues by the cells they cover and freeze their unknowns once for this pass
+        unknown_sets = {eq.pos: frozenset(eq.unknowns) for eq in constraints}
+        cell_clues: Dict[int, List[Clue]] = {}
+        for eq in constraints:
+            for cell in eq.unknowns:
+                cell_clues.setdefault(cell, []).append(eq)
 
         for eq in constraints:
             unknowns = eq.unknowns
@@ -85,64 +706,338 @@ class MineSolver:
 
             # If the number of mines left equals the number of unknowns, all unknowns are mines
             if mines_left == len(unknowns):
-                for pos in unknowns:
-                    if self.assignments.get(pos) != 1:
-                        self.assignments[pos] = 1
-                        self.actions.append(Action(pos[0], pos[1], True))
-                        progress = True
+                if self.apply_rule(ALL_MINES, unknowns, MINE):
+                    progress = True
                 continue
 
             # If no mines left, all unknowns are safe
             if mines_left == 0:
-                for pos in unknowns:
-                    if self.assignments.get(pos) != 0:
-                        self.assignments[pos] = 0
-                        self.actions.append(Action(pos[0], pos[1], False))
-                        progress = True
+                if self.apply_rule(ALL_SAFE, unknowns, SAFE):
+                    progress = True
                 continue
 
-            # Advanced inference: subset checking
-            for other_eq in constraints:
+            # Advanced inference: subset checking against the clues sharing a cell with this one
+            superset = unknown_sets[eq.pos]
+            candidates = {other_eq.pos: other_eq for cell in unknowns for other_eq in cell_clues[cell]}
+            for other_eq in candidates.values():
                 if other_eq is eq:
                     continue
-                if set(other_eq.unknowns).issubset(set(eq.unknowns)):
-                    subset = set(other_eq.unknowns)
-                    superset = set(eq.unknowns)
+                subset = unknown_sets[other_eq.pos]
+                if subset <= superset:
                     difference = superset - subset
                     mine_difference = eq.mines - other_eq.mines
 
-                    if mine_difference == len(difference):
-                        for pos in difference:
-                            if self.assignments.get(pos) != 1:
-                                self.assignments[pos] = 1
-                                self.actions.append(Action(pos[0], pos[1], True))
-                                progress = True
-
-                    elif mine_difference == 0:
-                        for pos in difference:
-                            if self.assignments.get(pos) != 0:
-                                self.assignments[pos] = 0
-                                self.actions.append(Action(pos[0], pos[1], False))
-                                progress = True
+                    if self.apply_difference(difference, mine_difference):
+                        progress = True
 
         return progress
 
-def generate_safe_mines(mines_count, width, height, first_x, first_y):
-    def random_mines():
-        mines = [[0] * height for _ in range(width)]
-        # 不在第一次点击的周围生成雷, 有雷的地方标记为1，随机
-        for _ in range(mines_count):
-            x, y = random.randint(0, width - 1), random.randint(0, height - 1)
-            if abs(x - first_x) <= 1 and abs(y - first_y) <= 1 or mines[x][y]:
-                continue
-            mines[x][y] = 1
-        return mines
-
-    while True:
-        mines = random_mines()
-        solver = MineSolver(mines)
-        actions = solver.solve(first_x, first_y)
-        if len(actions) == width * height:
+def attempt_rng(seed: int, attempt: int) -> random.Random:
+    """Random stream of one generation attempt, independent of every other attempt."""
+    return random.Random(f'{seed}:{attempt}')
+
+
+class MineSampler:
+    """Draws exactly ``mines_count`` distinct mines outside the 3x3 area around the first click."""
+
+    def __init__(self, mines_count, width, height, first_x, first_y):
+        self.mines_count = mines_count
+        self.grid = Grid(width, height)
+        # 不在第一次点击的周围生成雷, 候选格子按Grid的平坦下标编号
+        self.candidates = [self.grid.index(x, y) for x in range(width) for y in range(height)
+                           if abs(x - first_x) > 1 or abs(y - first_y) > 1]
+        if mines_count > len(self.candidates):
+            raise ValueError(f'{mines_count} mines do not fit outside the first click area')
+
+    def sample(self, rng: random.Random) -> Board:
+        """Draw a board in O(mines_count) with a partial Fisher-Yates shuffle.
+
+        The swaps are kept in a dict instead of being applied to the candidates, so
+        the sampler stays unchanged and can be shared between attempts and threads.
+        """
+        candidates = self.candidates
+        n = len(candidates)
+        swapped: Dict[int, int] = {}
+        mines = bytearray(self.grid.size)
+        for k in range(self.mines_count):
+            j = rng.randrange(k, n)
+            picked = swapped.get(j, j)
+            swapped[j] = swapped.get(k, k)
+            mines[candidates[picked]] = 1
+        return Board(self.grid, mines)
+
+
+@lru_cache(maxsize=8)
+def mine_sampler(mines_count, width, height, first_x, first_y) -> MineSampler:
+    """Sampler for a board setup, built once per process."""
+    return MineSampler(mines_count, width, height, first_x, first_y)
+
+
+def random_board(mines_count, width, height, first_x, first_y, rng: random.Random) -> Board:
+    return mine_sampler(mines_count, width, height, first_x, first_y).sample(rng)
+
+
+def random_mines(mines_count, width, height, first_x, first_y, rng: random.Random) -> List[List[int]]:
+    return random_board(mines_count, width, height, first_x, first_y, rng).layout()
+
+
+def is_solvable_board(board: Board, first_x, first_y, stats: Optional[Stats] = None,
+                      progress: Optional[Callable[[MineSolver], None]] = None) -> bool:
+    """Check that the solver resolves every cell of a board from the first click.
+
+    ``progress`` becomes the solver's progress callback.
+    """
+    solver = MineSolver(board, stats=stats)
+    solver.progress = progress
+    result = solver.check_solvable(first_x, first_y)
+    if stats is not None:
+        stats.counters[f'attempts_{result.reason}'] += 1
+    return result.solvable
+
+
+def stuck_moves(solver: MineSolver, rng: random.Random, moves: int) -> List[Tuple[int, int]]:
+    """Pick up to ``moves`` mine moves around the cells a stuck solver could not resolve.
+
+    Each picked frontier cell, an unknown cell next to a revealed one, trades places
+    with an unknown cell off the frontier: a frontier mine moves away, or a mine moves
+    onto a safe frontier cell. Only unknown cells change, so the first click area stays
+    empty. Returns (source, target) pairs of flat indices.
+    """
+    assignments = solver.assignments
+    mines = solver.mines
+    offsets = solver.grid.offsets
+    frontier: List[int] = []
+    inner: Tuple[List[int], List[int]] = ([], [])  # Safe and mine cells off the frontier
+    for i in solver.grid.cells():
+        if assignments[i] != UNKNOWN:
+            continue
+        if any(assignments[i + d] == SAFE for d in offsets):
+            frontier.append(i)
+        else:
+            inner[mines[i]].append(i)
+    for pool in inner:
+        rng.shuffle(pool)
+
+    picked = []
+    for i in rng.sample(frontier, min(moves, len(frontier))):
+        pool = inner[1 - mines[i]]
+        if pool:
+            other = pool.pop()
+            picked.append((i, other) if mines[i] else (other, i))
+    return picked
+
+
+def repair_board(board: Board, first_x, first_y, rng: random.Random, repairs: int,
+                 stats: Optional[Stats] = None,
+                 progress: Optional[Callable[[MineSolver], None]] = None) -> Tuple[Board, bool]:
+    """Solve a board, locally repairing it up to ``repairs`` times where the solver gets stuck.
+
+    A repair moves a few mines around the stuck frontier and resumes the solver from
+    the deductions that survive the move, instead of solving again from the first
+    click. Returns the last board and whether it was solved.
+    """
+    solver = MineSolver(board, stats=stats)
+    solver.progress = progress
+    # A fifty-fifty is rejected before solving, like without repairs, as drawing
+    # a new layout costs less than solving this one up to the fifty-fifty
+    solver.check_solvable(first_x, first_y)
+    for _ in range(repairs):
+        if not solver.unknown_count or solver.stop_reason is not None:
             break
+        moves = stuck_moves(solver, rng, REPAIR_MOVES)
+        if not moves:
+            break
+        board = board.copy()
+        for source, target in moves:
+            board.move_mine(source, target)
+        solver = solver.resume(board, [i for move in moves for i in move])
+        solver.deduce()
+        if stats is not None:
+            stats.counters['repairs'] += 1
+
+    result = solver.solve_result()
+    if stats is not None:
+        stats.counters[f'attempts_{result.reason}'] += 1
+    return board, result.solvable
+
+
+def check_attempt(mines_count, width, height, first_x, first_y, seed, attempt, repairs: int = 0,
+                  stats: Optional[Stats] = None,
+                  progress: Optional[Callable[[MineSolver], None]] = None) -> Tuple[Board, bool]:
+    """Board of one attempt, after its repairs, and whether the solver resolves every cell.
+
+    ``progress`` is called by every solver of the attempt after each round.
+    """
+    rng = attempt_rng(seed, attempt)
+    if stats is None:
+        board = random_board(mines_count, width, height, first_x, first_y, rng)
+    else:
+        with stats.timer('sample'):
+            board = random_board(mines_count, width, height, first_x, first_y, rng)
+    if repairs:
+        # The repairs draw from the same stream, so the attempt can be rebuilt
+        return repair_board(board, first_x, first_y, rng, repairs, stats, progress)
+    return board, is_solvable_board(board, first_x, first_y, stats, progress)
+
+
+def is_solvable_attempt(mines_count, width, height, first_x, first_y, seed, attempt,
+                        stats: Optional[Stats] = None, repairs: int = 0) -> bool:
+    """Generate the layout of one attempt and check that the solver resolves every cell."""
+    return check_attempt(mines_count, width, height, first_x, first_y, seed, attempt, repairs, stats)[1]
+
+
+@dataclass
+class GeneratedBoard:
+    mines: List[List[int]]  # Accepted layout, mines[x][y] is 1 for a mine
+    seed: int  # Seed of the generation run
+    attempt: int  # Index of the accepted attempt in that run
+    board: Optional[Board] = None  # The accepted board with its hints, None when read back from storage
+
+
+def generate_board(mines_count, width, height, first_x, first_y, seed: Optional[int] = None,
+                   rng: Optional[random.Random] = None, workers: int = 1,
+                   progress: Optional[Callable[[int], None]] = None,
+                   stats: Optional[Stats] = None, repairs: int = 0) -> GeneratedBoard:
+    """Generate a layout that can be solved without guessing from the first click.
+
+    Attempt ``n`` always draws its layout from ``attempt_rng(seed, n)`` and the lowest
+    solvable attempt is accepted, so a given seed produces the same board whether the
+    attempts are checked serially or spread over ``workers`` processes. Without a seed
+    one is drawn from ``rng``, or from the global random module. The returned seed and
+    attempt rebuild the layout with ``regenerate_mines`` without repeating the search.
+
+    ``progress`` is called with the number of attempts checked so far and may raise
+    to abandon the search. ``stats`` collects the attempts and, for serial runs, the
+    numbers of every solver; attempts checked in worker processes are only counted.
+
+    With ``repairs``, an attempt whose layout leaves the solver stuck is not thrown
+    away at once: up to ``repairs`` times, a few mines around the stuck frontier are
+    moved and the solver resumes from its deductions that are still valid, see
+    ``repair_board``. The same number of repairs rebuilds the board.
+    """
+    if seed is None:
+        seed = (rng if rng is not None else random).getrandbits(64)
+    args = (mines_count, width, height, first_x, first_y, seed)
+    start = time.perf_counter()
+
+    if workers <= 1:
+        attempt = 0
+        board, solvable = check_attempt(*args, attempt, repairs, stats)
+        while not solvable:
+            attempt += 1
+            if progress is not None:
+                progress(attempt)
+            board, solvable = check_attempt(*args, attempt, repairs, stats)
+    else:
+        attempt = parallel_first_solvable(args, workers, progress, stats, repairs)
+        board = regenerate_board(*args, attempt, repairs)
+
+    if stats is not None:
+        stats.timers['generate'] += time.perf_counter() - start
+        stats.counters['boards'] += 1
+        stats.attempts_per_board.append(attempt + 1)
+    return GeneratedBoard(board.layout(), seed, attempt, board)
+
+
+def regenerate_board(mines_count, width, height, first_x, first_y, seed: int, attempt: int,
+                     repairs: int = 0) -> Board:
+    """Board drawn by one attempt of a generation run.
+
+    With ``repairs`` the attempt's repairs are made again, which solves the board again.
+    """
+    if repairs:
+        return check_attempt(mines_count, width, height, first_x, first_y, seed, attempt, repairs)[0]
+    return random_board(mines_count, width, height, first_x, first_y, attempt_rng(seed, attempt))
+
+
+def regenerate_mines(mines_count, width, height, first_x, first_y, seed: int, attempt: int,
+                     repairs: int = 0) -> List[List[int]]:
+    """Layout drawn by one attempt of a generation run."""
+    return regenerate_board(mines_count, width, height, first_x, first_y, seed, attempt, repairs).layout()
+
+
+def generate_safe_mines(mines_count, width, height, first_x, first_y, seed: Optional[int] = None,
+                        rng: Optional[random.Random] = None, workers: int = 1,
+                        progress: Optional[Callable[[int], None]] = None,
+                        stats: Optional[Stats] = None, repairs: int = 0) -> List[List[int]]:
+    """Layout of ``generate_board``, without the seed and attempt."""
+    return generate_board(mines_count, width, height, first_x, first_y, seed, rng, workers, progress, stats,
+                          repairs).mines
+
+
+def generate_safe_board(mines_count, width, height, first_x, first_y, seed: Optional[int] = None,
+                        rng: Optional[random.Random] = None, workers: int = 1,
+                        progress: Optional[Callable[[int], None]] = None,
+                        stats: Optional[Stats] = None, repairs: int = 0) -> Board:
+    """Board of ``generate_board``, with the hints the solver already computed for it."""
+    return generate_board(mines_count, width, height, first_x, first_y, seed, rng, workers, progress, stats,
+                          repairs).board
+
+
+class AttemptCancelled(Exception):
+    """Raised in a worker process to stop an attempt that can no longer be accepted."""
+
+
+_cutoff = None  # Shared highest attempt still needed, set in the worker processes of parallel_first_solvable
+
+
+def _init_worker(cutoff):
+    global _cutoff
+    _cutoff = cutoff
+
+
+def _parallel_attempt(*args, attempt: int, repairs: int = 0) -> bool:
+    """Check one attempt in a worker, giving up after any round once a lower attempt was accepted."""
+
+    def check_cutoff(_solver: MineSolver):
+        if attempt > _cutoff.value:
+            raise AttemptCancelled()
+
+    return check_attempt(*args, attempt, repairs, progress=check_cutoff)[1]
+
+
+def parallel_first_solvable(args, workers: int, progress: Optional[Callable[[int], None]] = None,
+                            stats: Optional[Stats] = None, repairs: int = 0) -> int:
+    """Check attempts on a process pool and return the lowest solvable attempt index.
+
+    Once an attempt is accepted, the workers stop the attempts above it after their
+    current propagation round, so no worker is still busy when this returns.
+    """
+    # Shared without a lock: a stale read only delays a cancellation by one round
+    cutoff = multiprocessing.RawValue('q', 2 ** 62)
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cutoff,))
+    pending: Dict[Future, int] = {}
+    next_attempt = 0
+    checked = 0
+    accepted: Optional[int] = None
+    try:
+        while True:
+            # Keep every worker busy until an attempt is accepted
+            while accepted is None and len(pending) < workers * 2:
+                future = executor.submit(_parallel_attempt, *args, attempt=next_attempt, repairs=repairs)
+                pending[future] = next_attempt
+                next_attempt += 1
+            # Lower attempts still running could be solvable too, wait for them
+            if accepted is not None and all(attempt > accepted for attempt in pending.values()):
+                return accepted
 
-    return mines
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            checked += len(done)
+            if stats is not None:
+                stats.counters['attempts_checked'] += len(done)
+            if progress is not None:
+                progress(checked)
+            for future in done:
+                attempt = pending.pop(future)
+                if accepted is not None and attempt > accepted:
+                    continue  # No longer needed, and maybe stopped by the cutoff
+                if future.result() and (accepted is None or attempt < accepted):
+                    accepted = attempt
+                    cutoff.value = accepted
+                    for other, other_attempt in list(pending.items()):
+                        if other_attempt > accepted and other.cancel():
+                            del pending[other]
+    finally:
+        # Stop every attempt still running, they finish their round and exit
+        cutoff.value = -1
+        executor.shutdown(wait=True, cancel_futures=True)
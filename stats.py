@@ -0,0 +1,98 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Deduction rules counted in Stats.deductions
+ALL_MINES = 'all_mines'  # A clue needs as many mines as it has unknowns
+ALL_SAFE = 'all_safe'  # A clue needs no more mines
+SUBSET = 'subset'  # The cells one clue has beyond another
+LINEAR = 'linear'  # Bounds of the frontier clues after Gaussian elimination
+COMPONENTS = 'components'  # Enumeration of the frontier groups and the global mine count
+
+
+class Stats:
+    """Opt-in counters and timers for MineSolver and board generation.
+
+    Pass an instance as ``stats`` to collect numbers; without one, the solver and
+    generator only pay for a None check per propagation round and per deduction.
+    One instance can be shared by many solves to aggregate them.
+    """
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.timers: Dict[str, float] = Counter()  # Seconds spent per phase
+        self.deductions: Counter = Counter()  # Cells resolved per rule
+        self.clues_per_pass: List[int] = []  # Clues checked by every propagation round
+        self.attempts_per_board: List[int] = []  # Attempts used by every accepted board
+        self.profiler: Optional[cProfile.Profile] = None
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] += time.perf_counter() - start
+
+    def record_pass(self, clues: int, seconds: float):
+        """Account for one propagation round."""
+        self.counters['passes'] += 1
+        self.clues_per_pass.append(clues)
+        self.timers['propagate'] += seconds
+
+    @contextmanager
+    def profile(self) -> Iterator[cProfile.Profile]:
+        """Run cProfile over the block, adding to the profile of earlier blocks."""
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        try:
+            yield self.profiler
+        finally:
+            self.profiler.disable()
+
+    def profile_rows(self, limit: int = 20) -> List[dict]:
+        """The functions with the most cumulative time in the cProfile run."""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f'{filename}:{line}({name})',
+                'calls': calls,
+                'tottime': tottime,
+                'cumtime': cumtime,
+            })
+        rows.sort(key=lambda row: row['cumtime'], reverse=True)
+        return rows[:limit]
+
+    def report(self) -> dict:
+        """All numbers as plain data, ready for json.dump."""
+        clues = self.clues_per_pass
+        attempts = self.attempts_per_board
+        return {
+            'counters': dict(self.counters),
+            'timers': dict(self.timers),
+            'deductions': dict(self.deductions),
+            'clues_per_pass': {
+                'passes': len(clues),
+                'total': sum(clues),
+                'mean': sum(clues) / len(clues) if clues else 0.0,
+                'max': max(clues, default=0),
+            },
+            'attempts_per_board': {
+                'boards': len(attempts),
+                'mean': sum(attempts) / len(attempts) if attempts else 0.0,
+                'max': max(attempts, default=0),
+            },
+            'profile': self.profile_rows(),
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.report(), **kwargs)
@@ -1,30 +1,19 @@
+import queue
 import random
+import threading
 import tkinter as tk
-from copy import deepcopy
-from dataclasses import dataclass
 from tkinter import messagebox, ttk
 from tkinter.font import Font
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
-from solver import Action, MineSolver, generate_safe_mines
+from board import Board
+from game import Game, ReplayTimeline
+from pool import BoardPool
+from solver import Action, MineSolver
 
 
-@dataclass
-class GameState:
-    """游戏状态快照"""
-    mines: List[List[bool]]
-    hints: List[List[int]]
-    revealed: List[List[bool]]
-    flagged: List[List[bool]]
-    mines_remaining: int
-    game_over: bool
-
-
-@dataclass
-class ReplayStep:
-    """回放步骤，包含动作和执行后的状态"""
-    action: Action
-    state: GameState
+class SolveCancelled(Exception):
+    """AI求解被取消"""
 
 
 class Settings:
@@ -33,6 +22,89 @@ class Settings:
         self.height = 16
         self.mines = 99
         self.replay_speed = 1
+        self.renderer = 'auto'  # 'button'、'canvas'，或'auto'：格子数超过CANVAS_THRESHOLD时用画布
+
+
+CANVAS_THRESHOLD = 1000
+
+RENDERERS = {'auto': '自动', 'button': '按钮', 'canvas': '画布'}
+
+POLL_INTERVAL = 50  # 检查后台求解进度的间隔（毫秒）
+ACTION_WINDOW = 500  # 操作列表最多同时插入的行数，更长的操作序列只插入当前步骤附近的一段
+
+
+class CanvasCell:
+    """画布上的一个格子，可以像tk.Button一样用config修改外观"""
+
+    def __init__(self, canvas: tk.Canvas, rect: int, text: int):
+        self.canvas = canvas
+        self.rect = rect
+        self.text = text
+
+    def config(self, text=None, bg=None, fg=None, relief=None, **kwargs):
+        if text is not None or fg is not None:
+            options = {}
+            if text is not None:
+                options['text'] = text
+            if fg is not None:
+                options['fill'] = fg
+            self.canvas.itemconfig(self.text, **options)
+        if bg is not None or relief is not None:
+            options = {}
+            if bg is not None:
+                options['fill'] = bg
+            if relief is not None:
+                options['outline'] = CanvasBoard.OUTLINES[relief]
+            self.canvas.itemconfig(self.rect, **options)
+
+    configure = config
+
+
+class CanvasBoard:
+    """用一个Canvas绘制整个棋盘，每个格子预先创建一个矩形和一个文字"""
+    CELL_SIZE = 26
+    OUTLINES = {tk.RAISED: '#adb5bd', tk.SUNKEN: '#dee2e6'}
+
+    def __init__(self, parent, font, left_click, right_click):
+        self.canvas = tk.Canvas(parent, highlightthickness=0, bg='#f8f9fa')
+        self.canvas.grid(row=0, column=0)
+        self.font = font
+        self.width = 0
+        self.height = 0
+        self.cells: List[List[CanvasCell]] = []
+        self.canvas.bind('<Button-1>', lambda e: self.dispatch(e, left_click))
+        self.canvas.bind('<Button-3>', lambda e: self.dispatch(e, right_click))
+
+    def reset(self, width: int, height: int) -> List[List[CanvasCell]]:
+        """准备一局新游戏，尺寸不变时复用已有的图形项"""
+        if (width, height) == (self.width, self.height):
+            self.canvas.itemconfig('cell', fill='#e9ecef', outline=self.OUTLINES[tk.RAISED])
+            self.canvas.itemconfig('label', text='', fill='black')
+            return self.cells
+
+        self.canvas.delete('all')
+        size = self.CELL_SIZE
+        self.canvas.config(width=width * size, height=height * size)
+        self.cells = []
+        for x in range(width):
+            column = []
+            for y in range(height):
+                rect = self.canvas.create_rectangle(x * size + 1, y * size + 1, (x + 1) * size - 1, (y + 1) * size - 1,
+                                                    fill='#e9ecef', outline=self.OUTLINES[tk.RAISED], tags='cell')
+                text = self.canvas.create_text(x * size + size // 2, y * size + size // 2,
+                                               text='', font=self.font, tags='label')
+                column.append(CanvasCell(self.canvas, rect, text))
+            self.cells.append(column)
+        self.width = width
+        self.height = height
+        return self.cells
+
+    def dispatch(self, event, handler):
+        """把点击位置换算成格子坐标"""
+        x = event.x // self.CELL_SIZE
+        y = event.y // self.CELL_SIZE
+        if 0 <= x < self.width and 0 <= y < self.height:
+            handler(x, y)
 
 
 class SettingsWindow:
@@ -43,7 +115,7 @@ class SettingsWindow:
         self.callback = callback
 
         self.window.configure(bg='#f0f0f0')
-        self.window.geometry('300x300')
+        self.window.geometry('300x350')
         style = ttk.Style()
         style.configure('Settings.TLabel', font=('Microsoft YaHei UI', 10))
         style.configure('Settings.TEntry', font=('Microsoft YaHei UI', 10))
@@ -68,7 +140,12 @@ class SettingsWindow:
         self.speed_var = tk.StringVar(value=str(settings.replay_speed))
         ttk.Entry(main_frame, textvariable=self.speed_var, width=15).grid(row=3, column=1, padx=5, pady=10)
 
-        ttk.Button(main_frame, text="确定", command=self.apply_settings, style='Settings.TButton').grid(row=4, column=0, columnspan=2, pady=20)
+        ttk.Label(main_frame, text="渲染方式:", style='Settings.TLabel').grid(row=4, column=0, padx=5, pady=10, sticky=tk.W)
+        self.renderer_var = tk.StringVar(value=RENDERERS[settings.renderer])
+        ttk.Combobox(main_frame, textvariable=self.renderer_var, values=list(RENDERERS.values()),
+                     state='readonly', width=13).grid(row=4, column=1, padx=5, pady=10)
+
+        ttk.Button(main_frame, text="确定", command=self.apply_settings, style='Settings.TButton').grid(row=5, column=0, columnspan=2, pady=20)
 
     def apply_settings(self):
         try:
@@ -80,8 +157,8 @@ class SettingsWindow:
             if width < 5 or height < 5:
                 messagebox.showerror("错误", "宽度和高度至少为5")
                 return
-            if mines >= width * height:
-                messagebox.showerror("错误", "地雷数量不能大于或等于格子总数")
+            if mines > width * height - 9:
+                messagebox.showerror("错误", "地雷数量不能超过格子总数减9（首次点击周围不放雷）")
                 return
             if speed <= 0:
                 messagebox.showerror("错误", "回放速度必须大于0")
@@ -91,6 +168,7 @@ class SettingsWindow:
             self.settings.height = height
             self.settings.mines = mines
             self.settings.replay_speed = speed
+            self.settings.renderer = next(key for key, name in RENDERERS.items() if name == self.renderer_var.get())
             self.callback()
             self.window.destroy()
         except ValueError:
@@ -103,6 +181,11 @@ class Minesweeper:
         self.master.title("扫雷")
         self.settings = Settings()
         self.replay_timer: Optional[str] = None
+        self.board_pool = BoardPool()
+        self.canvas_board: Optional[CanvasBoard] = None
+        # 后台求解线程发回进度的队列和取消标志
+        self.solve_queue: Optional[queue.Queue] = None
+        self.solve_cancel: Optional[threading.Event] = None
 
         self.colors = {
             1: '#0000FF',  # 蓝色
@@ -146,6 +229,7 @@ class Minesweeper:
             ("新游戏", self.new_game),
             ("设置", self.open_settings),
             ("AI求解", self.start_ai_solve),
+            ("取消", self.cancel_ai_solve),
             ("暂停/继续", self.toggle_replay),
             ("后退", self.step_backward),
             ("前进", self.step_forward)
@@ -198,36 +282,39 @@ class Minesweeper:
     def new_game(self):
         """开始新游戏"""
         self.stop_replay()
+        if self.solve_cancel is not None:
+            self.solve_cancel.set()
+        self.solve_queue = None
+        use_canvas = self.settings.renderer == 'canvas' or (
+            self.settings.renderer == 'auto' and self.settings.width * self.settings.height > CANVAS_THRESHOLD)
         for widget in self.game_frame.winfo_children():
-            widget.destroy()
-
-        self.buttons = [[None for _ in range(self.settings.height)]
-                        for _ in range(self.settings.width)]
-        self.mines = [[False for _ in range(self.settings.height)]
-                      for _ in range(self.settings.width)]
-        self.hints = [[0 for _ in range(self.settings.height)]
-                      for _ in range(self.settings.width)]
-        self.revealed = [[False for _ in range(self.settings.height)]
-                         for _ in range(self.settings.width)]
-        self.flagged = [[False for _ in range(self.settings.height)]
-                        for _ in range(self.settings.width)]
+            if not (use_canvas and self.canvas_board is not None and widget is self.canvas_board.canvas):
+                widget.destroy()
 
-        for x in range(self.settings.width):
-            for y in range(self.settings.height):
-                self.buttons[x][y] = self.create_button(x, y)
+        self.game = Game(self.settings.width, self.settings.height, self.settings.mines)
+
+        if use_canvas:
+            if self.canvas_board is None:
+                self.canvas_board = CanvasBoard(self.game_frame, self.button_font, self.left_click, self.right_click)
+            self.buttons = self.canvas_board.reset(self.settings.width, self.settings.height)
+        else:
+            self.canvas_board = None
+            self.buttons = [[self.create_button(x, y) for y in range(self.settings.height)]
+                            for x in range(self.settings.width)]
 
-        self.game_started = False
-        self.game_over = False
-        self.mines_remaining = self.settings.mines
+        # 提前为AI求解的起点生成棋盘
+        self.board_pool.reserve(self.settings.width, self.settings.height, self.settings.mines,
+                                self.settings.width // 2, self.settings.height // 2)
         self.update_mine_count()
 
+        self.timeline: Optional[ReplayTimeline] = None
+        self.highlighted: Optional[Tuple[int, int]] = None  # 当前高亮显示的操作格子
         self.replay_steps = []
         self.current_step = 0
         self.is_replaying = False
         self.solving = False
 
-        for item in self.action_list.get_children():
-            self.action_list.delete(item)
+        self.clear_action_list()
         self.status_label.config(text="准备就绪")
 
     def create_button(self, x, y):
@@ -242,8 +329,12 @@ class Minesweeper:
         btn.bind('<Button-3>', lambda e, x=x, y=y: self.right_click(x, y))
         return btn
 
-    def place_mines(self, first_x, first_y):
-        """在首次点击后放置地雷"""
+    def place_mines(self, first_x, first_y) -> bool:
+        """在首次点击后放置地雷，返回是否已经放好
+
+        后台已经预先生成了棋盘时直接使用；否则在后台线程中现场生成，界面不会卡住，
+        生成完成后由poll_ai_solve放雷并重新执行这次点击。
+        """
         # positions = [(x, y) for x in range(self.settings.width)
         #              for y in range(self.settings.height)
         #              if abs(x - first_x) > 1 or abs(y - first_y) > 1]
@@ -252,114 +343,185 @@ class Minesweeper:
         # for x, y in mine_positions:
         #     self.mines[x][y] = True
 
-        self.mines = generate_safe_mines(self.settings.mines, self.settings.width, self.settings.height, first_x, first_y)
+        board = self.board_pool.take_ready(
+            self.settings.width, self.settings.height, self.settings.mines, first_x, first_y)
+        if board is not None:
+            self.game.place_mines(first_x, first_y, board)
+            return True
 
-        # Calculate hints
-        for x in range(self.settings.width):
-            for y in range(self.settings.height):
-                count = 0
-                for dx in [-1, 0, 1]:
-                    for dy in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < self.settings.width and 0 <= ny < self.settings.height:
-                            count += self.mines[nx][ny]
-                self.hints[x][y] = count
+        # 和AI求解共用后台线程的进度、取消和轮询
+        self.solving = True
+        self.status_label.config(text="正在生成棋盘...")
+        self.solve_queue = queue.Queue()
+        self.solve_cancel = threading.Event()
+        worker = threading.Thread(target=self.run_place_mines, name='PlaceMines', daemon=True,
+                                  args=(self.solve_queue, self.solve_cancel, self.game.copy(), first_x, first_y))
+        worker.start()
+        self.master.after(POLL_INTERVAL, self.poll_ai_solve, self.solve_queue)
+        return False
+
+    def run_place_mines(self, results: queue.Queue, cancel: threading.Event, game: Game, first_x, first_y):
+        """在后台线程中为首次点击生成棋盘，不能访问任何控件"""
+
+        def report_attempts(attempts: int):
+            if cancel.is_set():
+                raise SolveCancelled()
+            results.put(('attempts', attempts))
+
+        try:
+            board = self.board_pool.take(game.width, game.height, game.mines_count, first_x, first_y,
+                                         progress=report_attempts)
+            results.put(('placed', board, first_x, first_y))
+        except SolveCancelled:
+            results.put(('place_cancelled',))
+        except Exception as e:
+            results.put(('error', str(e)))
 
     def start_ai_solve(self):
-        """启动AI求解"""
-        if self.solving or self.is_replaying or self.game_over:
+        """启动AI求解，生成棋盘和求解都在后台线程中进行"""
+        if self.solving or self.is_replaying or self.game.state.game_over:
             return
         self.solving = True
 
         self.status_label.config(text="AI正在思考中...")
-        for item in self.action_list.get_children():
-            self.action_list.delete(item)
+        self.clear_action_list()
+
+        self.solve_queue = queue.Queue()
+        self.solve_cancel = threading.Event()
+        worker = threading.Thread(target=self.run_ai_solve, name='AISolve', daemon=True,
+                                  args=(self.solve_queue, self.solve_cancel, self.game.copy()))
+        worker.start()
+        self.master.after(POLL_INTERVAL, self.poll_ai_solve, self.solve_queue)
+
+    def cancel_ai_solve(self):
+        """请求后台求解停止，线程在下一次报告进度时退出"""
+        if not self.solving:
+            return
+        self.solve_cancel.set()
+        self.status_label.config(text="正在取消...")
+
+    def run_ai_solve(self, results: queue.Queue, cancel: threading.Event, game: Game):
+        """在后台线程中执行AI求解，不能访问任何控件
+
+        game是当前游戏的副本。需要时先放置地雷，然后求解并构建回放时间线。
+        进度和结果都放进results，由界面线程的poll_ai_solve取出。
+        """
+        start_x = game.width // 2
+        start_y = game.height // 2
+
+        def report_attempts(attempts: int):
+            if cancel.is_set():
+                raise SolveCancelled()
+            results.put(('attempts', attempts))
 
-        self.master.after(100, self.run_ai_solve)
+        def report_round(solver: MineSolver):
+            if cancel.is_set():
+                raise SolveCancelled()
+            # 边求解边记录时actions每轮都会清空，已确定的格子数才是累计的操作数
+            results.put(('round', solver.rounds, solver.width * solver.height - solver.unknown_count))
 
-    def run_ai_solve(self):
-        """执行AI求解"""
         try:
-            start_x = self.settings.width // 2
-            start_y = self.settings.height // 2
-
-            if not self.game_started:
-                self.game_started = True
-                self.place_mines(start_x, start_y)
-
-            solver = MineSolver(self.mines)
-            actions = solver.solve(start_x, start_y)
-
-            initial_state = GameState(
-                mines=deepcopy(self.mines),
-                hints=deepcopy(self.hints),
-                revealed=deepcopy(self.revealed),
-                flagged=deepcopy(self.flagged),
-                mines_remaining=self.mines_remaining,
-                game_over=False
-            )
-
-            self.replay_steps = []
-            current_state = initial_state
-
-            for action in actions:
-                next_state = GameState(
-                    mines=deepcopy(current_state.mines),
-                    hints=deepcopy(current_state.hints),
-                    revealed=deepcopy(current_state.revealed),
-                    flagged=deepcopy(current_state.flagged),
-                    mines_remaining=current_state.mines_remaining,
-                    game_over=current_state.game_over
-                )
-
-                if action.is_flag:
-                    next_state.flagged[action.x][action.y] = True
-                    next_state.mines_remaining -= 1
+            if not game.started:
+                game.place_mines(start_x, start_y, self.board_pool.take(
+                    game.width, game.height, game.mines_count, start_x, start_y, progress=report_attempts))
+            timeline = game.solve(start_x, start_y, progress=report_round)
+            results.put(('done', game, timeline))
+
+        except SolveCancelled:
+            results.put(('cancelled',))
+        except Exception as e:
+            results.put(('error', str(e)))
+
+    def poll_ai_solve(self, results: queue.Queue):
+        """取出后台求解发回的进度，求解结束后开始回放"""
+        if results is not self.solve_queue:
+            return  # 这次求解已经被新游戏放弃
+
+        while True:
+            try:
+                kind, *payload = results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'attempts':
+                self.status_label.config(text=f"正在生成棋盘：已尝试 {payload[0]} 次")
+            elif kind == 'round':
+                rounds, found = payload
+                self.status_label.config(text=f"AI正在思考中：第 {rounds} 轮传播，已找到 {found} 步操作")
+            else:
+                self.solving = False
+                self.solve_queue = None
+                if kind == 'done':
+                    self.finish_ai_solve(*payload)
+                elif kind == 'placed':
+                    self.finish_place_mines(*payload)
+                elif kind == 'place_cancelled':
+                    self.status_label.config(text="棋盘生成已取消")
+                elif kind == 'cancelled':
+                    self.status_label.config(text="AI求解已取消")
                 else:
-                    self.reveal_in_state(next_state, action.x, action.y)
-                    if next_state.mines[action.x][action.y]:
-                        next_state.game_over = True
+                    self.status_label.config(text=f"AI求解出错: {payload[0]}")
+                return
 
-                self.replay_steps.append(ReplayStep(action, next_state))
-                current_state = next_state
+        self.master.after(POLL_INTERVAL, self.poll_ai_solve, results)
 
-            self.current_step = 0
-            self.update_action_list()
-            self.start_replay()
-            self.status_label.config(text=f"共找到 {len(self.replay_steps)} 步操作")
+    def finish_place_mines(self, board: Board, first_x: int, first_y: int):
+        """后台生成的棋盘到了，放雷并完成首次点击"""
+        self.game.place_mines(first_x, first_y, board)
+        self.status_label.config(text="准备就绪")
+        self.left_click(first_x, first_y)
 
-        except Exception as e:
-            self.status_label.config(text=f"AI求解出错: {str(e)}")
-        finally:
-            self.solving = False
-
-    def reveal_in_state(self, state: GameState, x: int, y: int):
-        """在指定状态上执行揭示操作"""
-        if (not (0 <= x < self.settings.width and 0 <= y < self.settings.height) or
-                state.revealed[x][y] or state.flagged[x][y]):
-            return
+    def finish_ai_solve(self, game: Game, timeline: ReplayTimeline):
+        """接收后台构建好的时间线并开始回放
 
-        state.revealed[x][y] = True
-        if state.hints[x][y] == 0:
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    self.reveal_in_state(state, x + dx, y + dy)
+        求解期间棋盘不接受点击，后台的游戏副本和当前游戏一致，只是可能已经放置了地雷。
+        """
+        self.game = game
+        self.timeline = timeline
+        self.replay_steps = timeline.steps
+        self.current_step = 0
+        self.clear_action_list()
+        self.update_action_list()
+        self.start_replay()
+        self.status_label.config(text=f"共找到 {len(self.replay_steps)} 步操作")
+
+    def clear_action_list(self):
+        """清空操作列表"""
+        self.action_list.delete(*self.action_list.get_children())
+        self.action_rows = (0, 0)  # 已插入的步骤范围[start, end)
+
+    def fill_action_list(self, start: int, end: int):
+        """重新插入第start到end步，行的iid就是步骤的下标"""
+        self.clear_action_list()
+        insert = self.action_list.insert
+        for i in range(start, end):
+            action = self.replay_steps[i].action
+            action_text = "标记地雷" if action.is_flag else "点击格子"
+            insert("", "end", iid=str(i), values=(i + 1, f"{action_text} ({action.x}, {action.y})"))
+        self.action_rows = (start, end)
 
     def update_action_list(self):
-        """更新操作列表显示"""
-        for item in self.action_list.get_children():
-            self.action_list.delete(item)
+        """在操作列表中选中当前步骤
 
-        for i, step in enumerate(self.replay_steps):
-            action_text = f"标记地雷" if step.action.is_flag else "点击格子"
-            action_text += f" ({step.action.x}, {step.action.y})"
-            item = self.action_list.insert("", "end", values=(i+1, action_text))
-
-            if i == self.current_step - 1:
-                self.action_list.selection_set(item)
-                self.action_list.see(item)
+        每次求解后只插入一次所有行，之后只移动选中的行。操作序列超过ACTION_WINDOW步时
+        只插入当前步骤附近的一段，当前步骤移出这一段时再换成新的一段。
+        """
+        count = len(self.replay_steps)
+        if not count:
+            return
+        selected = self.current_step - 1
+        start, end = self.action_rows
+        if end - start < min(count, ACTION_WINDOW) or not start <= max(selected, 0) < end:
+            # 当前步骤之后多留一些行，顺序回放时很少需要更换
+            start = max(0, min(selected - ACTION_WINDOW // 4, count - ACTION_WINDOW))
+            self.fill_action_list(start, min(count, start + ACTION_WINDOW))
+
+        if selected >= 0:
+            item = str(selected)
+            self.action_list.selection_set(item)
+            self.action_list.see(item)
+        else:
+            self.action_list.selection_set(())
 
     def on_action_selected(self, event):
         """处理操作列表的选择事件"""
@@ -367,8 +529,7 @@ class Minesweeper:
         if not selection:
             return
 
-        item = self.action_list.item(selection[0])
-        step = int(item['values'][0]) - 1
+        step = int(selection[0])
         self.stop_replay()
         self.load_step(step)
         self.current_step = step + 1
@@ -378,55 +539,65 @@ class Minesweeper:
         """加载指定步骤的状态"""
         if 0 <= index < len(self.replay_steps):
             action = self.replay_steps[index].action
-            state = self.replay_steps[index].state
-            self.mines = deepcopy(state.mines)
-            self.hints = deepcopy(state.hints)
-            self.revealed = deepcopy(state.revealed)
-            self.flagged = deepcopy(state.flagged)
-            self.mines_remaining = state.mines_remaining
-            self.game_over = state.game_over
+            changed = self.timeline.seek(index + 1)
+            self.game.state = self.timeline.state
             self.update_mine_count()
-            self.update_board_display(action)
 
-    def update_board_display(self, action: Action):
-        for x in range(self.settings.width):
-            for y in range(self.settings.height):
-                btn = self.buttons[x][y]
+            # 只重绘变化的格子，以及新旧两个高亮格子
+            if changed is None:
+                self.update_board_display(action)
+            else:
+                cells = set(changed)
+                cells.add((action.x, action.y))
+                if self.highlighted is not None:
+                    cells.add(self.highlighted)
+                self.update_board_display(action, cells)
+
+    def update_board_display(self, action: Action, cells: Optional[Iterable[Tuple[int, int]]] = None):
+        """刷新棋盘显示，cells为None时重绘全部格子，否则只重绘给定的格子"""
+        if cells is None:
+            cells = ((x, y) for x in range(self.settings.width) for y in range(self.settings.height))
+        for x, y in cells:
+            self.draw_cell(x, y, x == action.x and y == action.y)
+        self.highlighted = (action.x, action.y)
+
+    def draw_cell(self, x: int, y: int, is_current: bool):
+        """按当前状态绘制一个格子"""
+        btn = self.buttons[x][y]
+        state = self.game.state
 
-                is_current = x == action.x and y == action.y
-
-                if self.revealed[x][y]:
-                    if self.mines[x][y]:
-                        if is_current:
-                            btn.config(text='💣', bg='#FF4040', relief=tk.SUNKEN)  # 更亮的红色
-                        else:
-                            btn.config(text='💣', bg='#FF6B6B', relief=tk.SUNKEN)
-                    elif self.hints[x][y] > 0:
-                        if is_current:
-                            btn.config(text=str(self.hints[x][y]),
-                                       relief=tk.SUNKEN,
-                                       bg='#E6F3FF',  # 淡蓝色背景
-                                       fg=self.colors[self.hints[x][y]])
-                        else:
-                            btn.config(text=str(self.hints[x][y]),
-                                       relief=tk.SUNKEN,
-                                       bg='#ffffff',
-                                       fg=self.colors[self.hints[x][y]])
-                    else:
-                        if is_current:
-                            btn.config(text='', relief=tk.SUNKEN, bg='#E6F3FF')  # 淡蓝色背景
-                        else:
-                            btn.config(text='', relief=tk.SUNKEN, bg='#ffffff')
-                elif self.flagged[x][y]:
-                    if is_current:
-                        btn.config(text='🚩', relief=tk.RAISED, bg='#FFE6E6')  # 淡红色背景
-                    else:
-                        btn.config(text='🚩', relief=tk.RAISED, bg='#e0e0e0')
+        if state.revealed[x][y]:
+            if state.mines[x][y]:
+                if is_current:
+                    btn.config(text='💣', bg='#FF4040', relief=tk.SUNKEN)  # 更亮的红色
                 else:
-                    if is_current:
-                        btn.config(text='', relief=tk.RAISED, bg='#E6F3FF')  # 淡蓝色背景
-                    else:
-                        btn.config(text='', relief=tk.RAISED, bg='#e0e0e0')
+                    btn.config(text='💣', bg='#FF6B6B', relief=tk.SUNKEN)
+            elif state.hints[x][y] > 0:
+                if is_current:
+                    btn.config(text=str(state.hints[x][y]),
+                               relief=tk.SUNKEN,
+                               bg='#E6F3FF',  # 淡蓝色背景
+                               fg=self.colors[state.hints[x][y]])
+                else:
+                    btn.config(text=str(state.hints[x][y]),
+                               relief=tk.SUNKEN,
+                               bg='#ffffff',
+                               fg=self.colors[state.hints[x][y]])
+            else:
+                if is_current:
+                    btn.config(text='', relief=tk.SUNKEN, bg='#E6F3FF')  # 淡蓝色背景
+                else:
+                    btn.config(text='', relief=tk.SUNKEN, bg='#ffffff')
+        elif state.flagged[x][y]:
+            if is_current:
+                btn.config(text='🚩', relief=tk.RAISED, bg='#FFE6E6')  # 淡红色背景
+            else:
+                btn.config(text='🚩', relief=tk.RAISED, bg='#e0e0e0')
+        else:
+            if is_current:
+                btn.config(text='', relief=tk.RAISED, bg='#E6F3FF')  # 淡蓝色背景
+            else:
+                btn.config(text='', relief=tk.RAISED, bg='#e0e0e0')
 
     def start_replay(self):
         """开始回放"""
@@ -464,12 +635,14 @@ class Minesweeper:
         self.load_step(self.current_step)
 
         # 检查是否游戏结束
-        if current_replay_step.state.game_over:
+        if current_replay_step.game_over:
             self.stop_replay()
             if not current_action.is_flag:  # 如果是点击操作导致的游戏结束
                 self.status_label.config(text="游戏结束：AI踩到地雷了！")
                 messagebox.showinfo("游戏结束", "AI踩到地雷了！")
             return
+        if self.game.won:
+            self.status_label.config(text=f"AI完成了棋盘，共 {len(self.replay_steps)} 步操作")
 
         self.current_step += 1
         self.update_action_list()
@@ -495,7 +668,7 @@ class Minesweeper:
             self.load_step(self.current_step)
             self.current_step += 1
 
-            if current_replay_step.state.game_over:
+            if current_replay_step.game_over:
                 if not current_action.is_flag:
                     self.status_label.config(text="游戏结束：AI踩到地雷了！")
                     messagebox.showinfo("游戏结束", "AI踩到地雷了！")
@@ -508,84 +681,81 @@ class Minesweeper:
         SettingsWindow(self.master, self.settings, self.new_game)
 
     def update_mine_count(self):
-        """更新剩余地雷数显示"""
-        self.mine_count_label.config(text=f"💣 剩余: {self.mines_remaining}")
-
-    def reveal(self, x, y):
-        """揭示一个格子"""
-        if (not (0 <= x < self.settings.width and 0 <= y < self.settings.height) or
-                self.revealed[x][y] or self.flagged[x][y]):
-            return
-
-        self.revealed[x][y] = True
-        btn = self.buttons[x][y]
-
-        if self.hints[x][y] > 0:
-            btn.config(text=str(self.hints[x][y]),
-                       relief=tk.SUNKEN,
-                       bg='#ffffff',
-                       fg=self.colors[self.hints[x][y]],
-                       state=tk.DISABLED)
-        elif self.hints[x][y] == 0:
-            btn.config(relief=tk.SUNKEN,
-                       bg='#ffffff',
-                       state=tk.DISABLED)
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    self.reveal(x + dx, y + dy)
+        """更新剩余地雷数和揭开进度显示"""
+        state = self.game.state
+        self.mine_count_label.config(
+            text=f"💣 剩余: {state.mines_remaining}    已揭开: {state.revealed_safe}/{self.game.safe_total}")
+
+    def reveal(self, x, y) -> List[Tuple[int, int]]:
+        """揭示一个格子，返回新揭开的格子"""
+        cells = self.game.reveal(x, y)
+        self.draw_revealed(cells)
+        return cells
+
+    def draw_revealed(self, cells: Iterable[Tuple[int, int]]):
+        """绘制新揭开的格子"""
+        hints = self.game.state.hints
+        for x, y in cells:
+            hint = hints[x][y]
+            if hint > 0:
+                self.buttons[x][y].config(text=str(hint),
+                                          relief=tk.SUNKEN,
+                                          bg='#ffffff',
+                                          fg=self.colors[hint],
+                                          state=tk.DISABLED)
+            else:
+                self.buttons[x][y].config(relief=tk.SUNKEN,
+                                          bg='#ffffff',
+                                          state=tk.DISABLED)
 
     def left_click(self, x, y):
         """处理左键点击事件"""
-        if self.game_over or self.flagged[x][y]:
+        game = self.game
+        if game.state.game_over or self.solving or game.state.flagged[x][y]:
             return
+        if self.timeline is not None:
+            self.timeline.detach()
 
-        if not self.game_started:
-            self.game_started = True
-            self.place_mines(x, y)
+        if not game.started and not self.place_mines(x, y):
+            return
 
-        if self.mines[x][y]:
-            self.game_over = True
-            self.reveal_all()
-            messagebox.showinfo("游戏结束", "踩到地雷了！")
+        self.draw_revealed(game.click(x, y))
+        self.update_mine_count()
+        if not game.state.game_over:
             return
 
-        self.reveal(x, y)
-        if self.check_win():
-            self.game_over = True
-            self.reveal_all()
+        won = game.won
+        self.reveal_all()
+        if won:
             messagebox.showinfo("恭喜", "你赢了！")
+        else:
+            messagebox.showinfo("游戏结束", f"踩到地雷了！标对了 {game.state.correct_flags} 个地雷")
 
     def right_click(self, x, y):
         """处理右键点击事件"""
-        if self.game_over or self.revealed[x][y]:
+        if self.solving or not self.game.toggle_flag(x, y):
             return
+        if self.timeline is not None:
+            self.timeline.detach()
 
-        self.flagged[x][y] = not self.flagged[x][y]
-        self.buttons[x][y].config(text='🚩' if self.flagged[x][y] else '')
-
-        self.mines_remaining += -1 if self.flagged[x][y] else 1
+        self.buttons[x][y].config(text='🚩' if self.game.state.flagged[x][y] else '')
         self.update_mine_count()
 
     def reveal_all(self):
-        """显示所有格子"""
+        """显示所有格子，只绘制，不改变游戏的计数"""
+        state = self.game.state
         for x in range(self.settings.width):
             for y in range(self.settings.height):
                 btn = self.buttons[x][y]
-                if self.mines[x][y]:
-                    if self.flagged[x][y]:
+                if state.mines[x][y]:
+                    if state.flagged[x][y]:
                         btn.config(text='💣', bg='#90EE90', relief=tk.SUNKEN)
                     else:
                         btn.config(text='💣', bg='#FF6B6B', relief=tk.SUNKEN)
-                elif self.flagged[x][y]:
+                elif state.flagged[x][y]:
                     btn.config(text='❌', bg='#FFB6C1', relief=tk.SUNKEN)
-                elif not self.revealed[x][y]:
-                    self.reveal(x, y)
-
-    def check_win(self):
-        """检查是否胜利"""
-        return all(self.revealed[x][y] or self.mines[x][y]
-                   for x in range(self.settings.width)
-                   for y in range(self.settings.height))
+                elif not state.revealed[x][y]:
+                    self.draw_revealed([(x, y)])
 
 
 if __name__ == '__main__':